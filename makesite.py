@@ -32,13 +32,50 @@
 
 
 
+import argparse
+import bisect
+import concurrent.futures
 import datetime
+import functools
+import hashlib
+import http.server
+import itertools
+import json
 import os
+import pickle
 import re
 import shutil
 import sys
+import threading
+import time
+import types
 
-from py import archive, log, plot
+from py import archive, export, log, plot
+
+
+# Map of each output in _site to the hash of the inputs it was built from.
+MANIFEST = os.path.join(archive.CACHE_DIR, 'site-manifest.json')
+
+# Rendered HTML of case numbers table rows.
+ROW_CACHE = os.path.join(archive.CACHE_DIR, 'rows.pickle')
+
+# Number of columns in case numbers table.
+CASE_COLUMNS = 9
+
+# Number of recent days whose rows are rendered in the home page with
+# --lazy. Rows of months before these days are loaded on demand.
+LAZY_DAYS = 30
+
+# Inputs watched for changes by serve().
+WATCHED = ['layout', 'static', 'indiacovid19.json']
+
+# Archive data loaded by build() and the hash of the JSON it was loaded
+# from, kept across builds by serve().
+loaded = {}
+
+# Source files whose changes require outputs to be rebuilt.
+SOURCES = ['makesite.py', 'py/archive.py', 'py/decimate.py', 'py/export.py',
+           'py/plot.py']
 
 
 def fread(filename):
@@ -56,27 +93,77 @@ def fwrite(filename, text):
         f.write(text)
 
 
-def render(template, **params):
-    """Replace placeholders in template with values from params."""
-    return re.sub(r'{{\s*([^}\s]+)\s*}}',
-                  lambda match: str(params.get(match.group(1), match.group(0))),
-                  template)
+# Placeholders like {{ name }} in layout templates.
+PLACEHOLDER = re.compile(r'{{\s*([^}\s]+)\s*}}')
 
+# Compiled layout templates and modification time of their files.
+templates = {}
 
-def case_links(data):
-    """Create HTML to display navigation links for case numbers table."""
-    prev_month = None
+
+def compile_template(template):
+    """Split template into literal text and placeholder segments."""
+    segments = []
+    pos = 0
+    for match in PLACEHOLDER.finditer(template):
+        segments.append((template[pos:match.start()], None))
+        segments.append((match.group(0), match.group(1)))
+        pos = match.end()
+    segments.append((template[pos:], None))
+    return [(text, name) for text, name in segments if text]
+
+
+def read_template(filename):
+    """Return compiled template from file, compiling it only if it changed."""
+    mtime = os.stat(filename).st_mtime_ns
+    cached = templates.get(filename)
+    if cached is None or cached[0] != mtime:
+        cached = mtime, compile_template(fread(filename))
+        templates[filename] = cached
+    return cached[1]
+
+
+def render_segments(segments, params):
+    """Generate text of compiled template with values from params.
+
+    A value may be a generator of text, e.g., rows of a large table, in
+    which case its text is generated piece by piece.
+    """
+    for text, name in segments:
+        if name is None:
+            yield text
+        else:
+            value = params.get(name, text)
+            if isinstance(value, types.GeneratorType):
+                yield from value
+            else:
+                yield value if isinstance(value, str) else str(value)
+
+
+def render_file(layout, filename, **params):
+    """Render layout file with values from params and write it to file."""
+    basedir = os.path.dirname(filename)
+    if not os.path.isdir(basedir):
+        os.makedirs(basedir)
+    with open(filename, 'w') as f:
+        f.writelines(render_segments(read_template(layout), params))
+
+
+def case_months(data):
+    """Return list of months in case numbers table."""
     months = []
     for date in data.dates:
-        curr_month = date[:7]
-        if curr_month != prev_month:
-            months.append(curr_month)
-        prev_month = curr_month
+        if not months or months[-1] != date[:7]:
+            months.append(date[:7])
+    return months
+
 
+def case_links(data, href='#{}'):
+    """Create HTML to display navigation links for case numbers table."""
     out = []
-    for month in months:
+    for month in case_months(data):
         text = datetime.datetime.strptime(month, '%Y-%m').strftime('%b %Y')
-        out.append('    <a href="#{}">[{}]</a>'.format(month, text))
+        out.append('    <a href="{}">[{}]</a>'.format(href.format(month),
+                                                    text))
     return '\n'.join(out) + '\n'
 
 
@@ -102,16 +189,14 @@ def case_head(month):
     return '\n'.join(out) + '\n'
 
 
-def case_refs(date, refs):
+def case_refs(date, day, refs):
     """Create HTML to display a list of refs in case numbers table."""
     out = []
     for ref_date, ref_link, ref_comment in refs:
         ref_date, ref_time = ref_date[:10], ref_date[11:]
         ref_day = ''
         if date != ref_date:
-            entry_datetime = datetime.datetime.strptime(date, '%Y-%m-%d')
-            ref_datetime = datetime.datetime.strptime(ref_date, '%Y-%m-%d')
-            plus = (ref_datetime - entry_datetime).days
+            plus = archive.day_ordinal(ref_date) - day
             ref_day = '<a href="#footnote3"><sup>+{}d</sup></a>'.format(plus)
         out.extend(['{}<a href="{}">{}</a>'
                     .format(ref_day, ref_link, ref_time)])
@@ -120,7 +205,8 @@ def case_refs(date, refs):
 
 def case_data(entry):
     """Create HTML to display a row of entry in case numbers table."""
-    (date, total, new, growth, days, active, cured, deaths, refs) = entry
+    (date, day, total, new, growth, days,
+     active, cured, deaths, refs) = entry
 
     if growth == -1:
         growth = '-'
@@ -142,46 +228,233 @@ def case_data(entry):
         '      <td class="active">{}</td>'.format(active),
         '      <td class="cured">{}</td>'.format(cured),
         '      <td class="death">{}</td>'.format(deaths),
-        '      <td class="ref">{}</td>'.format(case_refs(date, refs)),
+        '      <td class="ref">{}</td>'.format(case_refs(date, day, refs)),
         '    </tr>',
     ]
     return '\n'.join(out) + '\n'
 
 
-def case_rows(data):
-    """Create HTML to display row of case numbers in a table."""
+def row_key(entry):
+    """Return hash of an entry to be displayed in case numbers table."""
+    return hashlib.sha256(repr(entry).encode('utf-8')).hexdigest()
+
+
+def read_row_cache(code):
+    """Return cached HTML of case numbers table rows rendered by code."""
+    try:
+        with open(ROW_CACHE, 'rb') as f:
+            cached_code, rows = pickle.load(f)
+    except Exception:
+        return {}
+    return rows if cached_code == code else {}
+
+
+def write_row_cache(code, rows):
+    """Save HTML of case numbers table rows rendered by code."""
+    os.makedirs(archive.CACHE_DIR, exist_ok=True)
+    tmp_path = ROW_CACHE + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((code, rows), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, ROW_CACHE)
+
+
+def case_entries(data):
+    """Return list of keys and entries to be displayed in case numbers table."""
+    entries = zip(data.dates,
+                  data.days,
+                  data.total_cases,
+                  data.total_diffs,
+                  data.total_growths,
+                  data.doubling_times,
+                  data.active_cases,
+                  data.cured_cases,
+                  data.death_cases,
+                  data.refs)
+    return [(row_key(entry), entry) for entry in entries]
+
+
+def case_rows(entries, old_rows=None, rows=None):
+    """Generate HTML to display row of case numbers in a table.
+
+    Rows found in old_rows are reused instead of being rendered again.
+    All rows generated are recorded in rows.
+    """
+    old_rows = {} if old_rows is None else old_rows
+    rows = {} if rows is None else rows
     prev_month = None
-    out = ''
-    for i, entry in enumerate(zip(data.dates,
-                                  data.total_cases,
-                                  data.total_diffs,
-                                  data.total_growths,
-                                  data.doubling_times,
-                                  data.active_cases,
-                                  data.cured_cases,
-                                  data.death_cases,
-                                  data.refs)):
+    for key, entry in entries:
         curr_month = entry[0][:7]
         if curr_month != prev_month:
-            out += case_head(curr_month)
-        out += case_data(entry)
+            yield case_head(curr_month)
+        row = old_rows.get(key)
+        if row is None:
+            row = case_data(entry)
+        rows[key] = row
+        yield row
         prev_month = curr_month
-    return out
 
 
-def main():
-    """Render the home page."""
-    # Copy static files.
-    if os.path.isdir('_site'):
+def month_groups(entries):
+    """Yield each month and the keys and entries within it."""
+    for month, items in itertools.groupby(entries, lambda x: x[1][0][:7]):
+        yield month, list(items)
+
+
+def lazy_case_rows(months, entries, old_rows=None, rows=None):
+    """Generate HTML for case numbers table with months loaded on demand.
+
+    Each of the specified months is a placeholder to be filled with rows
+    loaded by js/rows.js. The specified entries are rendered as usual.
+    """
+    for month in months:
+        text = datetime.datetime.strptime(month, '%Y-%m').strftime('%b %Y')
+        yield ('    <tbody data-month="{}">\n'
+               '    <tr><td class="lazy" colspan="{}">'
+               '<a href="#{}">[Show {}]</a></td></tr>\n'
+               '    </tbody>\n'.format(month, CASE_COLUMNS, month, text))
+    yield from case_rows(entries, old_rows, rows)
+
+
+def input_hash(*inputs):
+    """Return hash of the specified inputs."""
+    sha = hashlib.sha256()
+    for item in inputs:
+        if not isinstance(item, bytes):
+            item = str(item).encode('utf-8')
+        sha.update(hashlib.sha256(item).digest())
+    return sha.hexdigest()
+
+
+def code_hash():
+    """Return hash of the source code that renders the website."""
+    return input_hash(*(fread(f) for f in SOURCES))
+
+
+def read_manifest():
+    """Return map of each output in _site to the hash of its inputs."""
+    try:
+        with open(MANIFEST) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest):
+    """Save map of each output in _site to the hash of its inputs."""
+    fwrite(MANIFEST, json.dumps(manifest, indent=2, sort_keys=True) + '\n')
+
+
+def outdated(output, key, manifest, old_manifest):
+    """Record input hash of output and check if it needs to be rebuilt."""
+    manifest[output] = key
+    return old_manifest.get(output) != key or not os.path.isfile(output)
+
+
+def copy_static(manifest, old_manifest):
+    """Copy static files to _site."""
+    for dirpath, dirnames, filenames in os.walk('static'):
+        for filename in filenames:
+            src = os.path.join(dirpath, filename)
+            dst = os.path.join('_site', os.path.relpath(src, 'static'))
+            if outdated(dst, archive.file_hash(src), manifest, old_manifest):
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                shutil.copy2(src, dst)
+
+
+def render_months(entries, links, code, old_rows, rows,
+                  manifest, old_manifest):
+    """Render one page of case numbers for each month."""
+    layout = 'layout/month.html'
+    layout_hash = archive.file_hash(layout)
+    for month, month_entries in month_groups(entries):
+        filename = '_site/{}.html'.format(month)
+        key = input_hash(layout_hash, links, code,
+                         *(item[0] for item in month_entries))
+        if outdated(filename, key, manifest, old_manifest):
+            log.log('Rendering {} ...', filename)
+            month_name = datetime.datetime.strptime(month, '%Y-%m')
+            render_file(layout, filename,
+                        month_name=month_name.strftime('%B %Y'),
+                        case_links=links,
+                        case_rows=case_rows(month_entries, old_rows, rows))
+
+
+def render_css(data, code, manifest, old_manifest):
+    """Render stylesheet with the maximum width of graphs."""
+    img_max_width = round(plot.plot_width(len(data.dates)) * 100 / 6.4)
+    layout = 'layout/main.css'
+    key = input_hash(archive.file_hash(layout), img_max_width, code)
+    if outdated('_site/main.css', key, manifest, old_manifest):
+        log.log('Rendering stylesheet ...')
+        render_file(layout, '_site/main.css', img_max_width=img_max_width)
+
+
+def export_data(data, manifest, old_manifest):
+    """Export data in small JSON files."""
+    files = export.export(data)
+    for path, text in files.items():
+        filename = '_site/api/' + path
+        if outdated(filename, input_hash(text), manifest, old_manifest):
+            fwrite(filename, text)
+
+
+def build(args):
+    """Build the website in _site."""
+    # Outputs are rebuilt only when their inputs change since last build.
+    if args.clean and os.path.isdir('_site'):
         shutil.rmtree('_site')
-    shutil.copytree('static', '_site')
-    shutil.copy('indiacovid19.json', '_site')
+    old_manifest = {} if args.clean else read_manifest()
+    manifest = {}
+    code = code_hash()
+    os.makedirs('_site', exist_ok=True)
+    with concurrent.futures.ThreadPoolExecutor() as stages:
+        build_stages(args, stages, code, manifest, old_manifest)
+
+    # Remove outputs that are no longer generated.
+    for output in old_manifest:
+        if output not in manifest and os.path.isfile(output):
+            log.log('Removing {} ...', output)
+            os.remove(output)
+            dirname = os.path.dirname(output)
+            while dirname != '_site' and not os.listdir(dirname):
+                os.rmdir(dirname)
+                dirname = os.path.dirname(dirname)
+
+    write_manifest(manifest)
+    log.log('Done')
+
+
+def build_stages(args, stages, code, manifest, old_manifest):
+    """Build outputs in _site running independent stages in threads."""
+    # Copy static files.
+    futures = [stages.submit(copy_static, manifest, old_manifest)]
+    json_hash = archive.file_hash('indiacovid19.json')
+    if outdated('_site/indiacovid19.json', json_hash, manifest, old_manifest):
+        shutil.copy('indiacovid19.json', '_site')
 
     # Load COVID-19 archive data.
-    log.log('Loading archive ...')
-    data = archive.load()
+    if loaded.get('json_hash') != json_hash:
+        log.log('Loading archive ...')
+        loaded['data'] = archive.load(cache=not args.no_cache)
+        loaded['json_hash'] = json_hash
+    data = loaded['data']
     log.log('Found entries for {} days', len(data.dates))
 
+    # Compute derived columns before the stages read them in threads.
+    for name in archive.DERIVED:
+        data.col(name)
+
+    # Start plotting graphs in worker processes while pages are rendered.
+    # Each plot is skipped by py.plot if its inputs have not changed.
+    plotting = None
+    if args.jobs > 1:
+        plotting = plot.start_plots(data, args.jobs)
+
+    # Render CSS and export data in small JSON files.
+    futures.append(stages.submit(render_css, data, code,
+                                 manifest, old_manifest))
+    futures.append(stages.submit(export_data, data, manifest, old_manifest))
+
     # Format placeholder values.
     last_updated = data.last_ref_datetimes[-1].strftime('%d %b %Y %H:%M IST')
     new_growth = plot.plus_percent_str(data.total_growths[-1])
@@ -189,12 +462,43 @@ def main():
     cured_percent = '{:.0f}%'.format(data.cured_percents[-1])
     death_percent = '{:.0f}%'.format(data.death_percents[-1])
     cured_ratio = '{:.1f}'.format(data.cured_ratios[-1])
-    img_max_width = round(len(data.dates) * 100 / 40)
+
+    # Select rows of case numbers table for each page.
+    entries = case_entries(data)
+    old_rows = {} if args.clean else read_row_cache(code)
+    rows = {}
+    lazy_entries = []
+    case_script = ''
+    if args.monthly:
+        home_entries = entries[-plot.recent_days:]
+        links = case_links(data, '{}.html')
+        example_href = '2020-03.html#2020-03-07'
+    elif args.lazy:
+        first_month = data.dates[-LAZY_DAYS:][0][:7]
+        first = bisect.bisect_left(data.dates, first_month)
+        lazy_entries = entries[:first]
+        home_entries = entries[first:]
+        links = case_links(data)
+        example_href = '#2020-03-07'
+        case_script = '\n<script src="js/rows.js"></script>'
+    else:
+        home_entries = entries
+        links = case_links(data)
+        example_href = '#2020-03-07'
+
+    # Render month pages.
+    if args.monthly:
+        futures.append(stages.submit(render_months, entries, links, code,
+                                     old_rows, rows, manifest, old_manifest))
 
     # Render home page.
-    log.log('Rendering home page ...')
-    layout = fread('layout/index.html')
-    output = render(layout,
+    layout = 'layout/index.html'
+    key = input_hash(archive.file_hash(layout), json_hash, code,
+                     args.monthly, args.lazy)
+    if outdated('_site/index.html', key, manifest, old_manifest):
+        log.log('Rendering home page ...')
+        lazy_months = [month for month, _ in month_groups(lazy_entries)]
+        render_file(layout, '_site/index.html',
                     last_total=data.total_cases[-1],
                     last_active=data.active_cases[-1],
                     last_cured=data.cured_cases[-1],
@@ -207,19 +511,117 @@ def main():
                     cured_percent=cured_percent,
                     death_percent=death_percent,
                     cured_ratio=cured_ratio,
-                    case_links=case_links(data),
-                    case_rows=case_rows(data))
-    fwrite('_site/index.html', output)
-
-    # Render CSS.
-    log.log('Rendering stylesheet ...')
-    layout = fread('layout/main.css')
-    output = render(layout, img_max_width=img_max_width)
-    fwrite('_site/main.css', output)
+                    case_links=links,
+                    case_rows=lazy_case_rows(lazy_months, home_entries,
+                                             old_rows, rows),
+                    case_script=case_script,
+                    example_href=example_href)
+
+    # Write rows of older months to be loaded by the home page on demand.
+    for month, month_entries in month_groups(lazy_entries):
+        filename = '_site/rows/{}.json'.format(month)
+        key = input_hash(code, *(item[0] for item in month_entries))
+        if outdated(filename, key, manifest, old_manifest):
+            html = ''.join(case_rows(month_entries, old_rows, rows))
+            fwrite(filename, export.dumps({'month': month, 'html': html}))
+
+    # Wait for the other stages before saving the rows they rendered.
+    for future in futures:
+        future.result()
+
+    # Save rendered rows of case numbers table.
+    if rows:
+        log.log('Reused {} of {} table rows',
+                len(rows.keys() & old_rows.keys()), len(rows))
+        rows = {key: rows.get(key) or old_rows[key] for key, entry in entries
+                if key in rows or key in old_rows}
+        write_row_cache(code, rows)
 
     # Plot graphs.
-    plot.plot_all(data)
-    log.log('Done')
+    if plotting is None:
+        plot.plot_all(data)
+    else:
+        plot.wait_plots(plotting)
+    for filename in sorted(os.listdir('_site/img')):
+        filename = '_site/img/' + filename
+        manifest[filename] = archive.file_hash(filename)
+
+
+def watched_mtimes():
+    """Return modification times of the inputs watched by serve()."""
+    filenames = []
+    for path in WATCHED:
+        for dirpath, dirnames, names in os.walk(path):
+            filenames.extend(os.path.join(dirpath, name) for name in names)
+        if os.path.isfile(path):
+            filenames.append(path)
+
+    # Files such as temporary files of editors may be deleted after they
+    # are listed.
+    mtimes = {}
+    for filename in filenames:
+        try:
+            mtimes[filename] = os.stat(filename).st_mtime_ns
+        except FileNotFoundError:
+            pass
+    return mtimes
+
+
+def serve(args):
+    """Serve the website and rebuild it whenever its inputs change."""
+    build(args)
+    args.clean = False
+    # Rebuilds plot only the changed graphs in this process instead of
+    # starting a new pool of worker processes every time.
+    args.jobs = 1
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler,
+                                directory='_site')
+    server = http.server.ThreadingHTTPServer(('localhost', args.port),
+                                             handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    log.log('Serving _site at http://localhost:{}/ ...', args.port)
+
+    mtimes = watched_mtimes()
+    try:
+        while True:
+            time.sleep(0.5)
+            new_mtimes = watched_mtimes()
+            if new_mtimes == mtimes:
+                continue
+            mtimes = new_mtimes
+            try:
+                build(args)
+            except Exception as e:
+                log.log('ERROR: makesite: Build failed: {!r}', e)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse JSON instead of using cached data')
+    parser.add_argument('--clean', action='store_true',
+                        help='Remove _site and rebuild all of it')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--monthly', action='store_true',
+                      help='Write case numbers of each month to its own page')
+    mode.add_argument('--lazy', action='store_true',
+                      help='Load case numbers of older months on demand')
+    parser.add_argument('-j', type=int, default=os.cpu_count() or 1,
+                        metavar='N', dest='jobs',
+                        help='Plot graphs in N worker processes '
+                             '(default: number of CPUs; 1 for rebuilds '
+                             'in serve mode)')
+    parser.add_argument('--serve', action='store_true',
+                        help='Serve _site and rebuild it on changes')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port to serve _site on (default: 8000)')
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        build(args)
 
 
 if __name__ == '__main__':
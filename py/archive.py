@@ -24,15 +24,42 @@
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 
+import argparse
+import bisect
 import datetime
+import hashlib
 import json
 import math
+import os
+import pickle
 import re
 
+import numpy as np
+
+from py import log
+
+
+# Directory for cached Data objects. Increment CACHE_VERSION whenever the
+# layout of Data or the computation of any column changes.
+CACHE_DIR = '_cache'
+CACHE_VERSION = 7
+
+# Proleptic Gregorian ordinal of 1970-01-01, the epoch of NumPy datetimes.
+EPOCH_DAY = datetime.date(1970, 1, 1).toordinal()
+
+# Columns computed from JSON entries. All other columns are derived from
+# these when they are first requested. See DERIVED.
+BASE_COLUMNS = (
+    'days', 'last_ref_minutes', 'active_cases', 'cured_cases', 'death_cases',
+)
+
 
 class Data:
     """Container for all data read and derived from source JSON."""
-    def __init__(self):
+    def __init__(self, ignore_dates=()):
+        # Dates for which entries are skipped.
+        self.ignore_dates = tuple(ignore_dates)
+
         # Master data map.
         self.master = {
         }
@@ -41,148 +68,623 @@ class Data:
         self.dates = []
         self.refs = []
 
-        # Cumulative totals until each date.
-        self.active_cases = []
-        self.cured_cases = []
-        self.death_cases = []
-        self.total_cases = []
-
-        # Increment or decrement w.r.t. previous day for each date.
-        self.active_diffs = []
-        self.cured_diffs = []
-        self.death_diffs = []
-        self.total_diffs = []
-
-        # Cured and death percents within closed cases.
-        self.cured_percents = []
-        self.death_percents = []
-        self.cured_ratios = []
-        self.cfr_percents = []
-
-        # Growth w.r.t previous day for each date.
-        self.active_growths = [-1]
-        self.cured_growths = [-1]
-        self.death_growths = [-1]
-        self.total_growths = [-1]
-        self.doubling_times = [-1]
-
-        # Date and time as Python objects instead of strings.
-        self.datetimes = []
-        self.last_ref_datetimes = []
-
-
-def load(ignore_dates=()):
-    """Load data from JSON and populate module variables."""
-    with open('indiacovid19.json') as f:
-        entries = json.load(f)
+        # Dates as proleptic Gregorian ordinals in the 'days' column,
+        # minute of the day of the last reference in 'last_ref_minutes',
+        # and case numbers and derived metrics in the remaining columns.
+        # Counts and times are integer arrays. Other metrics are float
+        # arrays with NaN representing undefined values.
+        self.columns = {name: np.zeros(0, np.int64) for name in BASE_COLUMNS}
 
-    # Load entries into a dict to map each date to its entry and references.
-    data = Data()
-    for entry in entries:
-        (date, active, cured, death, ref_date, ref_link, ref_comment) = entry
-
-        if date in ignore_dates:
-            continue
-
-        if date not in data.master:
-            data.dates.append(date)
-            data.datetimes.append(datetime.datetime.strptime(date, '%Y-%m-%d'))
-            data.master[date] = {'refs': []}
-
-        data.master[date]['active'] = active
-        data.master[date]['cured'] = cured
-        data.master[date]['death'] = death
-        data.master[date]['closed'] = cured + death
-        data.master[date]['total'] = active + cured + death
-        data.master[date]['refs'].append([ref_date, ref_link, ref_comment])
-
-    # Split the dict into separate lists for use with matplotlib.pyplot.
-    for date in data.dates:
-        entry = data.master[date]
-        # Case numbers.
-        data.active_cases.append(entry['active'])
-        data.cured_cases.append(entry['cured'])
-        data.death_cases.append(entry['death'])
-        data.total_cases.append(entry['total'])
-        # Cured and death percents within closed cases.
-        if entry['closed'] == 0:
-            data.cured_percents.append(-1)
-            data.death_percents.append(-1)
+        # State required to extend doubling times to new dates.
+        self.half_finder = HalfFinder()
+
+    def __getattr__(self, name):
+        """Return list view of a column, e.g., data.total_cases.
+
+        Date and time as Python objects are also available as list
+        views named datetimes and last_ref_datetimes. The dense daily
+        index of dates is available as calendar.
+        """
+        if name == 'calendar':
+            view = Calendar(self.col('days'))
+        elif name == 'datetimes':
+            view = [datetime.datetime.fromordinal(d) for d in self.days]
+        elif name == 'last_ref_datetimes':
+            view = [datetime.datetime.fromordinal(d) +
+                    datetime.timedelta(minutes=m)
+                    for d, m in zip(self.days, self.last_ref_minutes)]
+        elif name in BASE_COLUMNS or name in DERIVED:
+            view = to_list(self.col(name))
         else:
-            data.cured_percents.append(100 * entry['cured'] / entry['closed'])
-            data.death_percents.append(100 * entry['death'] / entry['closed'])
-            assert data.cured_percents[-1] + data.death_percents[-1] == 100
-        # Cured ratio and CFR.
-        if entry['death'] == 0:
-            data.cured_ratios.append(-1)
-            data.cfr_percents.append(-1)
+            raise AttributeError(name)
+        self.__dict__[name] = view
+        return view
+
+    def col(self, name):
+        """Return NumPy array for the specified column.
+
+        A derived column is computed along with the columns it depends
+        on when it is first requested and kept for later requests.
+        """
+        if name not in self.columns:
+            func, deps = DERIVED[name]
+            self.columns[name] = func(self, 0, *map(self.col, deps))
+        return self.columns[name]
+
+    def window(self, start=None, end=None, last_n_days=None):
+        """Return a view of the columns for a range of dates.
+
+        The range includes the dates from start to end, both in
+        YYYY-MM-DD format. If last_n_days is specified, the range is
+        further limited to that many days ending with the last date.
+        The dates must be in ascending order.
+        """
+        begin = 0
+        stop = len(self.dates)
+        if start is not None:
+            begin = bisect.bisect_left(self.dates, start)
+        if end is not None:
+            stop = bisect.bisect_right(self.dates, end)
+        if last_n_days is not None and stop > 0:
+            days = self.col('days')
+            first_day = days[stop - 1] - last_n_days + 1
+            begin = max(begin, int(np.searchsorted(days, first_day)))
+        return Window(self, begin, max(begin, stop))
+
+    def extend(self, entries):
+        """Add JSON entries and update the dates affected by them.
+
+        Only the dates that receive new entries and the dates after them
+        are recomputed. The result is identical to loading all entries
+        at once.
+        """
+        start = len(self.dates)
+        for entry in entries:
+            (date, active, cured, death,
+             ref_date, ref_link, ref_comment) = entry
+
+            if date in self.ignore_dates:
+                continue
+
+            if date not in self.master:
+                self.dates.append(date)
+                self.master[date] = {'refs': []}
+            elif date == self.dates[-1]:
+                start = min(start, len(self.dates) - 1)
+            elif start > 0:
+                start = min(start, self.dates.index(date))
+
+            self.master[date]['active'] = active
+            self.master[date]['cured'] = cured
+            self.master[date]['death'] = death
+            self.master[date]['closed'] = cured + death
+            self.master[date]['total'] = active + cured + death
+            self.master[date]['refs'].append([ref_date, ref_link,
+                                              ref_comment])
+
+        if start < len(self.dates):
+            for name in list(self.columns) + VIEWS:
+                self.__dict__.pop(name, None)
+            update_columns(self, start)
+
+
+# Views that are not columns.
+VIEWS = ['calendar', 'datetimes', 'last_ref_datetimes']
+
+
+class Calendar:
+    """Dense daily index of all days from the first date to the last date.
+
+    The dates must be in ascending order. Days without an entry are gaps
+    in the calendar.
+    """
+    def __init__(self, days):
+        days = np.asarray(days)
+        self.first_day = int(days[0]) if len(days) else 0
+        n = int(days[-1]) - self.first_day + 1 if len(days) else 0
+
+        # Ordinal of each day in the calendar.
+        self.days = np.arange(self.first_day, self.first_day + n)
+
+        # Position of the entry for each day or -1 if it is a gap.
+        self.positions = np.full(n, -1)
+        self.positions[days - self.first_day] = np.arange(len(days))
+        self.present = self.positions >= 0
+
+        # Position of the latest entry on or before each day.
+        self.latest = np.maximum.accumulate(self.positions)
+
+    def __len__(self):
+        return len(self.days)
+
+    def index(self, day):
+        """Return index of the specified day in the calendar."""
+        return day - self.first_day
+
+    def zero_filled(self, column):
+        """Return column values for each day with 0 for gaps."""
+        column = np.asarray(column)
+        out = np.zeros(len(self.days), dtype=column.dtype)
+        out[self.present] = column[self.positions[self.present]]
+        return out
+
+    def forward_filled(self, column):
+        """Return column values for each day with gaps filled forward."""
+        return np.asarray(column)[self.latest]
+
+
+class Window:
+    """View of the columns of Data for a contiguous range of dates.
+
+    Columns are returned as NumPy views into the columns of Data, so
+    creating a window does not copy any data.
+    """
+    def __init__(self, data, begin, end):
+        self.data = data
+        self.begin = begin
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.begin
+
+    @property
+    def dates(self):
+        """Return list of dates in the window."""
+        return self.data.dates[self.begin:self.end]
+
+    def col(self, name):
+        """Return NumPy view of the specified column within the window."""
+        return self.data.col(name)[self.begin:self.end]
+
+
+def to_list(column):
+    """Convert column to list with -1 in place of undefined values."""
+    if column.dtype.kind == 'f':
+        return [-1 if math.isnan(x) else x for x in column.tolist()]
+    return column.tolist()
+
+
+def load(ignore_dates=(), cache=True):
+    """Load data from JSON, or from cache if the JSON has not changed."""
+    if not cache:
+        return parse(read_entries(), ignore_dates)
+
+    json_hash = file_hash('indiacovid19.json')
+    source_hash = file_hash(__file__)
+    cache_path = cache_filename(ignore_dates)
+    cached = read_cache(cache_path)
+    if cached is not None and cached['source_hash'] != source_hash:
+        cached = None
+    if cached is not None and cached['json_hash'] == json_hash:
+        return cached['data']
+
+    # Reuse cached data if the JSON has only new entries appended to it,
+    # i.e., the bytes up to the end of the last cached entry are the same.
+    data = None
+    if cached is not None and cached['entries_end'] is not None:
+        end = cached['entries_end']
+        if file_hash('indiacovid19.json', end) == cached['entries_hash']:
+            entries = read_tail('indiacovid19.json', end)
+            if entries is not None:
+                data = cached['data']
+                data.extend(entries)
+
+    if data is None:
+        data = parse(read_entries(), ignore_dates)
+
+    # Compute derived columns now so that they are cached too.
+    for name in DERIVED:
+        data.col(name)
+
+    end = entries_end('indiacovid19.json')
+    write_cache(cache_path, {
+        'json_hash': json_hash,
+        'source_hash': source_hash,
+        'entries_end': end,
+        'entries_hash': end and file_hash('indiacovid19.json', end),
+        'data': data,
+    })
+    return data
+
+
+def read_entries(filename='indiacovid19.json'):
+    """Yield entries from JSON file one at a time.
+
+    The file is expected to have one entry per line between lines
+    containing the opening and closing brackets, as written by
+    mohfw.update_json(). If any line does not fit this layout, the whole
+    file is parsed at once and the remaining entries are yielded from it.
+    """
+    count = 0
+    with open(filename) as f:
+        lines = (line.strip() for line in f)
+        lines = (line for line in lines if line != '')
+        if next(lines, None) == '[':
+            try:
+                for entry in entry_lines(lines):
+                    yield entry
+                    count += 1
+                return
+            except ValueError:
+                pass
+
+    log.log('WARN: archive: {} does not have one entry per line', filename)
+    with open(filename) as f:
+        entries = json.load(f)
+    yield from entries[count:]
+
+
+def entry_lines(lines):
+    """Yield entries from lines with one entry per line up to ']'.
+
+    ValueError is raised at the first line that does not fit this
+    layout, after the entries before it have been yielded.
+    """
+    entry, comma = None, False
+    for line in lines:
+        if line == ']':
+            if not comma and next(lines, None) is None:
+                if entry is not None:
+                    yield entry
+                return
+            break
+        if entry is not None:
+            if not comma:
+                break
+            yield entry
+        comma = line.endswith(',')
+        try:
+            entry = json.loads(line[:-1] if comma else line)
+        except ValueError:
+            break
+        if not isinstance(entry, list) or len(entry) != 7:
+            break
+    raise ValueError('JSON does not have one entry per line')
+
+
+def read_tail(filename, offset):
+    """Return entries appended to JSON file after byte offset.
+
+    The offset is the end of the last entry in an earlier version of the
+    file. None is returned if the rest of the file is not a comma
+    followed by one entry per line as written by mohfw.update_json().
+    """
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        tail = f.read().decode('utf-8').lstrip()
+    if not tail.startswith(','):
+        return None
+    lines = (line.strip() for line in tail[1:].splitlines())
+    lines = (line for line in lines if line != '')
+    try:
+        return list(entry_lines(lines))
+    except ValueError:
+        return None
+
+
+def entries_end(filename):
+    """Return byte offset of the end of the last entry in JSON file.
+
+    None is returned if the file does not end with a list of entries.
+    """
+    with open(filename, 'rb') as f:
+        content = f.read().rstrip()
+    if not content.endswith(b']'):
+        return None
+    end = len(content[:-1].rstrip())
+    if not content[:end].endswith(b']'):
+        return None
+    return end
+
+
+def file_hash(filename, size=None):
+    """Return SHA-256 hash of file content, or of its first size bytes."""
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        if size is None:
+            for chunk in iter(lambda: f.read(65536), b''):
+                sha.update(chunk)
         else:
-            data.cured_ratios.append(entry['cured'] / entry['death'])
-            data.cfr_percents.append(100 * entry['death'] / entry['total'])
-        # List of references for each date.
+            sha.update(f.read(size))
+    return sha.hexdigest()
+
+
+def cache_filename(ignore_dates):
+    """Return path of cache file for data loaded with ignore_dates."""
+    key = repr(sorted(ignore_dates)).encode('utf-8')
+    key = hashlib.sha256(key).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, 'archive-{}.pickle'.format(key))
+
+
+def read_cache(cache_path):
+    """Return cached data and its metadata as a dict."""
+    try:
+        with open(cache_path, 'rb') as f:
+            version, cached = pickle.load(f)
+    except Exception:
+        return None
+    if version != CACHE_VERSION:
+        return None
+    return cached
+
+
+def write_cache(cache_path, cached):
+    """Save data and its metadata to cache."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((CACHE_VERSION, cached), f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def parse(entries, ignore_dates=()):
+    """Create Data from JSON entries."""
+    data = Data(ignore_dates)
+    data.extend(entries)
+    return data
+
+
+def update_columns(data, start):
+    """Update columns for the dates from index start onwards.
+
+    Base columns are computed from master. Derived columns computed so
+    far are updated in the order of their dependencies. Values for dates
+    before start are kept as they are.
+    """
+    c = data.columns
+    entries = [data.master[date] for date in data.dates[start:]]
+
+    # List of references and last reference time for each date.
+    del data.refs[start:]
+    last_ref_times = []
+    for date, entry in zip(data.dates[start:], entries):
         data.refs.append(entry['refs'])
-        # Last reference time for each date.
         last_ref_time = entry['refs'][-1][0]
         if last_ref_time[:10] != date:
             last_ref_time = date + ' 23:59'
-        last_ref_datetime = datetime.datetime.strptime(last_ref_time,
-                                                       '%Y-%m-%d %H:%M')
-        data.last_ref_datetimes.append(last_ref_datetime)
-
-    # Populate increment/decrement in numbers for each date.
-    data.active_diffs.append(data.active_cases[0])
-    data.cured_diffs.append(data.cured_cases[0])
-    data.death_diffs.append(data.death_cases[0])
-    data.total_diffs.append(data.total_cases[0])
-    for i in range(1, len(data.dates)):
-        data.active_diffs.append(data.active_cases[i] -
-                                 data.active_cases[i - 1])
-        data.cured_diffs.append(data.cured_cases[i] -
-                                data.cured_cases[i - 1])
-        data.death_diffs.append(data.death_cases[i] -
-                                data.death_cases[i - 1])
-        data.total_diffs.append(data.total_cases[i] -
-                                data.total_cases[i - 1])
-        data.active_growths.append(calc_growths(data.active_cases[i - 1],
-                                                data.active_cases[i]))
-        data.cured_growths.append(calc_growths(data.cured_cases[i - 1],
-                                               data.cured_cases[i]))
-        data.death_growths.append(calc_growths(data.death_cases[i - 1],
-                                               data.death_cases[i]))
-        data.total_growths.append(calc_growths(data.total_cases[i - 1],
-                                               data.total_cases[i]))
-        data.doubling_times.append(calc_doubling_time(data, i))
-    return data
+        last_ref_times.append(last_ref_time)
 
+    t = {}
 
-def calc_growths(prev_num, curr_num):
-    """Calculate the percentage growth of curr_num over prev_num."""
-    if prev_num == 0:
-        return -1  # -1 represents undefined growth.
-    else:
-        return 100 * (curr_num - prev_num) / prev_num
+    # Dates and times parsed as integers.
+    t['days'] = parse_days(data.dates[start:])
+    t['last_ref_minutes'] = (parse_minutes(last_ref_times) -
+                             (t['days'] - EPOCH_DAY) * 1440)
 
+    # Cumulative totals until each date.
+    t['active_cases'] = np.array([e['active'] for e in entries], np.int64)
+    t['cured_cases'] = np.array([e['cured'] for e in entries], np.int64)
+    t['death_cases'] = np.array([e['death'] for e in entries], np.int64)
+
+    for name, tail in t.items():
+        c[name] = np.concatenate((c[name][:start], tail))
+
+    for name, (func, deps) in DERIVED.items():
+        if name in c:
+            tail = func(data, start, *(c[dep] for dep in deps))
+            c[name] = np.concatenate((c[name][:start], tail))
+
+
+# Functions to compute derived columns. Each function receives the index
+# of the first date to compute and the columns the derived column depends
+# on. It returns the derived column for the dates from that index onwards.
+
+def derive_sum(data, start, *nums):
+    """Add numbers for each date."""
+    out = nums[0][start:]
+    for n in nums[1:]:
+        out = out + n[start:]
+    return out
+
+
+def derive_diffs(data, start, nums):
+    """Increment or decrement w.r.t. previous day for each date."""
+    k = max(start - 1, 0)
+    return np.diff(nums[k:], prepend=0)[start - k:]
+
+
+def derive_growths(data, start, nums):
+    """Growth percent w.r.t. previous day for each date."""
+    k = max(start - 1, 0)
+    return calc_growth_column(nums[k:])[start - k:]
+
+
+def derive_percents(data, start, nums, dens):
+    """Percent of numbers within another set of numbers."""
+    return calc_percents(nums[start:], dens[start:])
+
+
+def derive_death_percents(data, start, death, closed, cured_percents):
+    """Death percent within closed cases."""
+    death_percents = calc_percents(death[start:], closed[start:])
+    cured_percents = cured_percents[start:]
+    defined = ~np.isnan(cured_percents)
+    assert np.all(cured_percents[defined] + death_percents[defined] == 100)
+    return death_percents
+
+
+def derive_ratios(data, start, nums, dens):
+    """Ratio of numbers to another set of numbers."""
+    return calc_ratios(nums[start:], dens[start:])
+
+
+def derive_cfr_percents(data, start, death, total):
+    """Case fatality rate, undefined until the first death."""
+    cfr_percents = calc_percents(death[start:], total[start:])
+    cfr_percents[death[start:] == 0] = np.nan
+    return cfr_percents
+
+
+def derive_doubling_times(data, start, total, days, last_ref_minutes):
+    """Number of days it took for total cases to double."""
+    finder = data.half_finder
+    if finder.count == start + 1:
+        finder.undo()
+    elif finder.count != start:
+        finder = data.half_finder = HalfFinder()
+    s = finder.count
+    ref_minutes = days * 1440 + last_ref_minutes
+    return calc_doubling_tail(total, ref_minutes, finder)[start - s:]
 
-def calc_doubling_time(data, i):
-    """Calculate the number of days it took for total cases to double."""
-    n3 = data.total_cases[i]
-    t3 = data.last_ref_datetimes[i]
-    for n1, t1 in zip(data.total_cases[i::-1],
-                      data.last_ref_datetimes[i::-1]):
-        if n1 <= n3/2:
-            break
-        n2 = n1
-        t2 = t1
-    else:
-        return -1  # -1 represents undefined doubling time.
-    seconds = ((t3 - t2).total_seconds() +
-               (t2 - t1).total_seconds() * (n2 - n3/2) / (n2 - n1))
-    days = seconds / 86400
-    return days
+
+# Derived columns mapped to the function that computes them and the
+# columns they depend on. Every column appears after its dependencies.
+DERIVED = {
+    # Cumulative totals until each date.
+    'total_cases': (derive_sum, ('active_cases', 'cured_cases',
+                                 'death_cases')),
+    'closed_cases': (derive_sum, ('cured_cases', 'death_cases')),
+
+    # Increment or decrement w.r.t. previous day for each date.
+    'active_diffs': (derive_diffs, ('active_cases',)),
+    'cured_diffs': (derive_diffs, ('cured_cases',)),
+    'death_diffs': (derive_diffs, ('death_cases',)),
+    'total_diffs': (derive_diffs, ('total_cases',)),
+
+    # Cured and death percents within closed cases.
+    'cured_percents': (derive_percents, ('cured_cases', 'closed_cases')),
+    'death_percents': (derive_death_percents, ('death_cases', 'closed_cases',
+                                               'cured_percents')),
+
+    # Cured ratio and CFR.
+    'cured_ratios': (derive_ratios, ('cured_cases', 'death_cases')),
+    'cfr_percents': (derive_cfr_percents, ('death_cases', 'total_cases')),
+
+    # Growth w.r.t previous day for each date.
+    'active_growths': (derive_growths, ('active_cases',)),
+    'cured_growths': (derive_growths, ('cured_cases',)),
+    'death_growths': (derive_growths, ('death_cases',)),
+    'total_growths': (derive_growths, ('total_cases',)),
+
+    # Number of days it took for total cases to double.
+    'doubling_times': (derive_doubling_times, ('total_cases', 'days',
+                                               'last_ref_minutes')),
+}
+
+
+def parse_days(dates):
+    """Convert dates in YYYY-MM-DD format to ordinals."""
+    days = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    return days + EPOCH_DAY
+
+
+def parse_minutes(times):
+    """Convert times in YYYY-MM-DD HH:MM format to minutes since epoch."""
+    return np.array(times, dtype='datetime64[m]').astype(np.int64)
+
+
+def day_ordinal(date):
+    """Convert a date in YYYY-MM-DD format to ordinal."""
+    return datetime.date(int(date[:4]), int(date[5:7]),
+                         int(date[8:10])).toordinal()
+
+
+def format_day(day):
+    """Convert ordinal to date in YYYY-MM-DD format."""
+    return datetime.date.fromordinal(day).isoformat()
+
+
+def calc_ratios(nums, dens):
+    """Calculate nums / dens with NaN wherever dens is zero."""
+    out = np.full(len(nums), np.nan)
+    np.divide(nums, dens, out=out, where=(dens != 0))
+    return out
+
+
+def calc_percents(nums, dens):
+    """Calculate 100 * nums / dens with NaN wherever dens is zero."""
+    return calc_ratios(100 * nums, dens)
+
+
+def calc_growth_column(nums):
+    """Calculate the percentage growth of each number over its previous."""
+    out = np.full(len(nums), np.nan)
+    out[1:] = calc_percents(nums[1:] - nums[:-1], nums[:-1])
+    return out
+
+
+class HalfFinder:
+    """Find the latest date with at most half of the given total cases.
+
+    The only candidates for such a date are the dates with fewer total
+    cases than every later date. They are kept on a stack with strictly
+    increasing case numbers, so the latest candidate with at most a
+    given number of cases is found with bisect.
+    """
+    def __init__(self):
+        self.count = 0
+        self.indices = []
+        self.nums = []
+        self.popped = []
+
+    def push(self, num):
+        """Add total cases of next date and return index of its half."""
+        i = self.count
+        self.popped = []
+        while self.nums and self.nums[-1] >= num:
+            self.popped.append((self.indices.pop(), self.nums.pop()))
+        self.indices.append(i)
+        self.nums.append(num)
+        self.count += 1
+        k = bisect.bisect_right(self.nums, num / 2) - 1
+        if k < 0 or self.indices[k] == i:
+            return -1
+        return self.indices[k]
+
+    def undo(self):
+        """Remove the date added by the last push."""
+        self.indices.pop()
+        self.nums.pop()
+        for i, num in reversed(self.popped):
+            self.indices.append(i)
+            self.nums.append(num)
+        self.popped = []
+        self.count -= 1
+
+
+def calc_doubling_times(total_cases, ref_minutes):
+    """Calculate the number of days it took for total cases to double.
+
+    Each date's last reference time is given in ref_minutes as minutes
+    since any fixed epoch.
+    """
+    return calc_doubling_tail(total_cases, ref_minutes, HalfFinder())
+
+
+def calc_doubling_tail(total_cases, ref_minutes, finder):
+    """Calculate doubling times for the dates not yet pushed to finder.
+
+    For each date, the latest date on or before it with at most half the
+    total cases is located. The doubling time is then interpolated
+    between that date and the date following it. NaN represents
+    undefined doubling time.
+    """
+    start = finder.count
+    total_cases = np.asarray(total_cases)
+    half_indices = np.array([finder.push(num) for num in
+                             total_cases[start:].tolist()], dtype=np.int64)
+
+    doubling_times = np.full(len(half_indices), np.nan)
+    found = np.flatnonzero(half_indices >= 0)
+    i1 = half_indices[found]
+    i2 = i1 + 1
+    i3 = found + start
+    seconds = 60 * np.asarray(ref_minutes, dtype=np.float64)
+    n1, n2, n3 = total_cases[i1], total_cases[i2], total_cases[i3]
+    t1, t2, t3 = seconds[i1], seconds[i2], seconds[i3]
+    doubling_times[found] = ((t3 - t2) +
+                             (t2 - t1) * (n2 - n3 / 2) / (n2 - n1)) / 86400
+    return doubling_times
 
 
 def main():
-    data = load()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse JSON instead of using cached data')
+    args = parser.parse_args()
+
+    data = load(cache=not args.no_cache)
     for a, b, c, d, e in zip(data.dates, data.total_cases, data.total_diffs,
                              data.total_growths, data.doubling_times):
         print('{} {:6} {:+6} ({:+4.1f}%) ({:2.1f} d)'.format(a, b, c, d, e))
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Shape-preserving downsampling of series for plotting.
+
+Each function selects at most n points of a series given by x and y
+values in ascending order of x, always keeping the first and the last
+point. Points with undefined (NaN) y values are dropped. The cost of
+each function grows with n, apart from a single vectorized pass over
+the series.
+"""
+
+
+import numpy as np
+
+
+def finite(x, y):
+    """Return x and y values of points where y is defined."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    defined = ~np.isnan(y)
+    return x[defined], y[defined]
+
+
+def lttb(x, y, n):
+    """Select n points with Largest-Triangle-Three-Buckets."""
+    x, y = finite(x, y)
+    size = len(x)
+    if n >= size or n < 3:
+        return x, y
+
+    # Split all points except the first and the last into n - 2 buckets.
+    edges = np.linspace(1, size - 1, n - 1).astype(int)
+    selected = np.empty(n, dtype=int)
+    selected[0] = 0
+    selected[-1] = size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_lo, next_hi = edges[i + 1], edges[i + 2]
+            cx = x[next_lo:next_hi].mean()
+            cy = y[next_lo:next_hi].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+
+        # Pick the point that forms the largest triangle with the point
+        # selected in the previous bucket and the next bucket's average.
+        areas = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) -
+                       (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return x[selected], y[selected]
+
+
+def minmax(x, y, n):
+    """Select the minimum and maximum points of (n - 2) // 2 buckets."""
+    x, y = finite(x, y)
+    size = len(x)
+    if n >= size or n < 4:
+        return x, y
+
+    edges = np.linspace(0, size, (n - 2) // 2 + 1).astype(int)
+    selected = {0, size - 1}
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        selected.add(lo + int(np.argmin(y[lo:hi])))
+        selected.add(lo + int(np.argmax(y[lo:hi])))
+    selected = sorted(selected)
+    return x[selected], y[selected]
@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Prepare the generated website for deployment behind a CDN.
+
+This copies the website generated in _site to _dist, adds a content hash
+to the name of every image and stylesheet, rewrites the references to
+them, and writes compressed copies of the text files alongside them. To
+run it, enter this command at the top-level directory of this project
+after generating the website:
+
+    python3 -m py.dist
+"""
+
+
+import argparse
+import concurrent.futures
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+
+from py import log
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Files whose names get a content hash.
+FINGERPRINT_EXTS = ('.png', '.ico', '.css')
+
+# Files that are compressed.
+COMPRESS_EXTS = ('.html', '.css', '.js', '.json', '.txt', '.svg')
+
+# Files that are never renamed because they are requested by fixed names.
+FIXED_NAMES = ('favicon.ico',)
+
+# References to other files in HTML and CSS.
+REF_REGEX = re.compile(r'''((?:href|src)="|url\(['"]?)([^"'()#?:]+)''')
+
+
+def fingerprint(path, content):
+    """Return path with hash of content added to the file name."""
+    root, ext = posixpath.splitext(path)
+    return '{}.{}{}'.format(root, hashlib.sha256(content).hexdigest()[:10],
+                            ext)
+
+
+def rewrite_refs(path, content, names):
+    """Replace references in content of file at path with renamed files."""
+    basedir = posixpath.dirname(path)
+
+    def replace(match):
+        ref = posixpath.normpath(posixpath.join(basedir, match.group(2)))
+        if ref not in names:
+            return match.group(0)
+        return match.group(1) + posixpath.relpath(names[ref], basedir or '.')
+
+    text = REF_REGEX.sub(replace, content.decode('utf-8'))
+    return text.encode('utf-8')
+
+
+def compress(filename):
+    """Write compressed copies of file next to it."""
+    with open(filename, 'rb') as f:
+        content = f.read()
+    with open(filename + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(filename + '.br', 'wb') as f:
+            f.write(brotli.compress(content))
+    return filename
+
+
+def build(src='_site', dst='_dist', jobs=1):
+    """Copy website to dst with fingerprinted and compressed files."""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.relpath(os.path.join(dirpath, filename), src)
+            paths.append(path.replace(os.sep, '/'))
+
+    # Process images first, stylesheets next, and pages last, so that
+    # references to renamed files are rewritten before each file's own
+    # hash is computed.
+    def order(path):
+        return path.endswith('.css') + 2 * path.endswith('.html'), path
+
+    names = {}
+    contents = {}
+    for path in sorted(paths, key=order):
+        with open(os.path.join(src, path), 'rb') as f:
+            content = f.read()
+        if path.endswith(('.html', '.css')):
+            content = rewrite_refs(path, content, names)
+        if (path.endswith(FINGERPRINT_EXTS) and
+                posixpath.basename(path) not in FIXED_NAMES):
+            names[path] = fingerprint(path, content)
+        contents[path] = content
+
+    if os.path.isdir(dst):
+        shutil.rmtree(dst)
+    outputs = []
+    for path in paths:
+        filename = os.path.join(dst, names.get(path, path))
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'wb') as f:
+            f.write(contents[path])
+        if path.endswith(COMPRESS_EXTS):
+            outputs.append(filename)
+
+    log.log('Renamed {} files with content hash', len(names))
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        for filename in executor.map(compress, outputs):
+            log.log('Compressed {}', filename)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-j', type=int, default=os.cpu_count() or 1,
+                        metavar='N', dest='jobs',
+                        help='Compress files in N threads '
+                             '(default: number of CPUs)')
+    parser.add_argument('src', nargs='?', default='_site',
+                        help='Directory that contains the generated website')
+    parser.add_argument('dst', nargs='?', default='_dist',
+                        help='Directory to write the website for deployment')
+    args = parser.parse_args()
+    build(args.src, args.dst, args.jobs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Export archive data as small JSON files for clients of the website.
+
+The exported files are:
+
+  - index.json: Dates covered and paths of all other files.
+  - latest.json: All metrics and references for the last date.
+  - months/YYYY-MM.json: All metrics for each date of a month.
+  - series/METRIC.json: One metric for all dates.
+
+Undefined values are represented as null. To export the files to
+_site/api, enter this command at the top-level directory of this project:
+
+    python3 -m py.export
+"""
+
+
+import argparse
+import json
+import math
+import os
+
+from py import archive, log
+
+
+# Columns of archive.Data exported as metrics.
+METRICS = (
+    'total_cases',
+    'active_cases',
+    'cured_cases',
+    'death_cases',
+    'total_diffs',
+    'active_diffs',
+    'cured_diffs',
+    'death_diffs',
+    'total_growths',
+    'doubling_times',
+    'cured_percents',
+    'death_percents',
+    'cured_ratios',
+    'cfr_percents',
+)
+
+
+def values(column):
+    """Convert column to list with None in place of undefined values."""
+    if column.dtype.kind == 'f':
+        return [None if math.isnan(x) else round(x, 2)
+                for x in column.tolist()]
+    return column.tolist()
+
+
+def dumps(obj):
+    """Serialize object to compact JSON."""
+    return json.dumps(obj, separators=(',', ':')) + '\n'
+
+
+def export(data):
+    """Return map of path of each exported file to its content."""
+    files = {}
+
+    months = []
+    for date in data.dates:
+        if not months or months[-1] != date[:7]:
+            months.append(date[:7])
+
+    month_files = []
+    for month in months:
+        w = data.window(month + '-01', month + '-31')
+        path = 'months/{}.json'.format(month)
+        chunk = {'month': month, 'dates': w.dates}
+        for name in METRICS:
+            chunk[name] = values(w.col(name))
+        files[path] = dumps(chunk)
+        month_files.append({'month': month, 'path': path,
+                            'first_date': w.dates[0],
+                            'last_date': w.dates[-1]})
+
+    series_files = {}
+    for name in METRICS:
+        path = 'series/{}.json'.format(name)
+        files[path] = dumps({'metric': name, 'dates': data.dates,
+                             'values': values(data.col(name))})
+        series_files[name] = path
+
+    last_updated = data.last_ref_datetimes[-1].strftime('%Y-%m-%d %H:%M')
+    latest = {'date': data.dates[-1], 'last_updated': last_updated}
+    w = data.window(start=data.dates[-1])
+    for name in METRICS:
+        latest[name] = values(w.col(name))[0]
+    latest['refs'] = data.refs[-1]
+    files['latest.json'] = dumps(latest)
+
+    files['index.json'] = dumps({
+        'first_date': data.dates[0],
+        'last_date': data.dates[-1],
+        'metrics': list(METRICS),
+        'latest': 'latest.json',
+        'months': month_files,
+        'series': series_files,
+    })
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse JSON instead of using cached data')
+    parser.add_argument('outdir', nargs='?', default='_site/api',
+                        help='Directory to write exported files to')
+    args = parser.parse_args()
+
+    data = archive.load(cache=not args.no_cache)
+    files = export(data)
+    for path, text in files.items():
+        filename = os.path.join(args.outdir, path)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, 'w') as f:
+            f.write(text)
+    log.log('Exported {} files to {}', len(files), args.outdir)
+
+
+if __name__ == '__main__':
+    main()
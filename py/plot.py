@@ -28,10 +28,19 @@
 
 
 import argparse
+import concurrent.futures
+import functools
+import hashlib
+import math
+import multiprocessing
 import os
 import matplotlib as mpl
-import matplotlib.pyplot as plt
-from py import archive, log
+import matplotlib.dates
+import matplotlib.figure
+import matplotlib.text
+import matplotlib.transforms
+import numpy as np
+from py import archive, decimate, log
 
 
 total_color = '#06c'
@@ -40,190 +49,360 @@ cured_color = '#393'
 death_color = '#c33'
 recent_days = 30
 
-
-def plot_begin(data):
-    """Set up a new plot."""
-    global formatted_dates
-    formatted_dates = [d.strftime('%d %b %Y') for d in data.datetimes]
-    plt.clf()
-
-
-def plot_end(data, img_name, recent, aspect, legend_loc='best'):
-    """Configure current plot and export it to an image file."""
-    if recent:
-        filename = img_name + '-recent.png'
-        legend_size = 'small'
-    else:
-        filename = img_name + '.png'
-        legend_size = 'medium'
+# Width in inches per day of graphs of all days, the maximum width of
+# such graphs, and the minimum space between date labels.
+day_width = 0.16
+max_width = 24
+
+# Downsampling method from py.decimate for each graph of all days whose
+# series are downsampled to one point per day_width before plotting.
+decimation = {
+    'total-cases-linear': 'lttb',
+    'total-cases-log': 'lttb',
+    'growth-percent': 'minmax',
+    'doubling-time': 'lttb',
+    'cured-percent': 'lttb',
+    'cured-ratio': 'lttb',
+}
+
+# Image name, number of recent days and columns of each graph.
+plot_inputs = {
+    'total-cases-linear': ('total-cases-linear', recent_days + 1,
+                           ('total_cases', 'active_cases', 'cured_cases',
+                            'death_cases')),
+    'total-cases-log': ('total-cases-log', recent_days + 1,
+                        ('total_cases', 'active_cases', 'cured_cases',
+                         'death_cases')),
+    'new-cases': ('new-cases', recent_days, ('total_diffs',)),
+    'growth-percents': ('growth-percent', recent_days + 1,
+                        ('total_growths',)),
+    'doubling-times': ('doubling-time', recent_days + 1,
+                       ('doubling_times',)),
+    'cured-percents': ('cured-percent', recent_days + 1,
+                       ('cured_percents', 'death_percents')),
+    'cured-ratios': ('cured-ratio', recent_days + 1, ('cured_ratios',)),
+}
+
+# Hash of the inputs each image file in _site/img was rendered from.
+PLOT_CACHE_DIR = os.path.join(archive.CACHE_DIR, 'plots')
+
+
+def plot_window(data, recent, days=recent_days + 1):
+    """Return window of data to be plotted."""
+    return data.window(last_n_days=days) if recent else data.window()
+
+
+class ValueLabels(mpl.artist.Artist):
+    """Vertical text values at points of a series drawn as one artist.
+
+    A single Text object is moved to each point in turn to draw the
+    labels from left to right. A label that would overlap the last label
+    drawn is skipped.
+    """
+    def __init__(self, color, size='x-small'):
+        super().__init__()
+        self.text = mpl.text.Text(ha='center', rotation='vertical',
+                                  size=size, color=color)
+        self.points = []
+        self.set_zorder(3)
+        self.set_clip_on(False)
+
+    def set_figure(self, fig):
+        super().set_figure(fig)
+        self.text.set_figure(fig)
+
+    def set_transform(self, t):
+        super().set_transform(t)
+        self.text.set_transform(t)
+
+    def add(self, x, y, text):
+        """Add label with text centered horizontally above point (x, y)."""
+        self.points.append((x, y, str(text)))
+
+    def layout(self, renderer):
+        """Move text to each label that is drawn and yield its extent."""
+        last = None
+        for x, y, text in self.points:
+            self.text.set_position((x, y))
+            self.text.set_text(text)
+            box = self.text.get_window_extent(renderer)
+            if last is not None and box.overlaps(last):
+                continue
+            last = box
+            yield box
+
+    def draw(self, renderer):
+        """Draw labels that do not overlap each other."""
+        if not self.get_visible():
+            return
+        for box in self.layout(renderer):
+            self.text.draw(renderer)
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        """Return bounding box of labels in display coordinates."""
+        if renderer is None:
+            renderer = self.figure.canvas.get_renderer()
+        boxes = list(self.layout(renderer))
+        if not boxes:
+            return mpl.transforms.Bbox.null()
+        return mpl.transforms.Bbox.union(boxes)
+
+
+def plot_filename(img_name, recent):
+    """Return name of image file for a plot."""
+    return img_name + '-recent.png' if recent else img_name + '.png'
+
+
+@functools.lru_cache()
+def source_hash():
+    """Return hash of the source code that plots the graphs."""
+    return (archive.file_hash(__file__) +
+            archive.file_hash(decimate.__file__))
+
+
+def plot_key(w, img_name, recent, aspect, *columns):
+    """Return hash of the data and parameters a plot is rendered from."""
+    sha = hashlib.sha256()
+    params = img_name, recent, aspect, columns, mpl.__version__
+    sha.update(repr(params).encode('utf-8'))
+    sha.update(source_hash().encode('utf-8'))
+    for name in ('days',) + columns:
+        sha.update(w.col(name).tobytes())
+    return sha.hexdigest()
+
+
+def plot_input(data, name, recent, aspect):
+    """Return window of data plotted by a task and hash of its inputs."""
+    img_name, days, columns = plot_inputs[name]
+    w = plot_window(data, recent, days)
+    return w, plot_key(w, img_name, recent, aspect, *columns)
+
+
+def plot_unchanged(img_name, recent, key):
+    """Check if image file of a plot was rendered from the same inputs."""
+    filename = plot_filename(img_name, recent)
+    try:
+        with open(os.path.join(PLOT_CACHE_DIR, filename + '.key')) as f:
+            cached = f.read()
+    except OSError:
+        return False
+    if cached != key or not os.path.isfile('_site/img/' + filename):
+        return False
+    log.log('Plot {} is up-to-date', filename)
+    return True
+
+
+def plot_width(days):
+    """Return width in inches of a graph of all days."""
+    return min(day_width * days, max_width)
+
+
+def decimated(img_name, recent, xs, ys):
+    """Downsample series of a graph of all days if configured for it."""
+    method = decimation.get(img_name)
+    if recent or method is None:
+        return xs, ys
+    n = int(plot_width(len(xs)) / day_width)
+    return getattr(decimate, method)(xs, ys, n)
+
+
+def plot_begin(w):
+    """Create figure, axes and numeric x values of dates for a new plot."""
+    fig = mpl.figure.Figure()
+    ax = fig.add_subplot()
+    dates = (w.col('days') - archive.EPOCH_DAY).astype('datetime64[D]')
+    return fig, ax, mpl.dates.date2num(dates)
+
+
+def plot_end(fig, ax, w, img_name, recent, aspect, key, legend_loc='best'):
+    """Configure plot and export it to an image file."""
+    filename = plot_filename(img_name, recent)
+    legend_size = 'small' if recent else 'medium'
 
     if aspect == 'square':
         plot_size = 4.8, 4.8
     elif aspect == 'wide':
         plot_size = 9.4, 4.8
     else:
-        plot_size = 0.16 * len(data.dates), 4.8
-
-    plt.gcf().set_size_inches(plot_size)
-    plt.grid(which='major', linewidth='0.4')
-    plt.grid(which='minor', linewidth='0.1')
-    plt.xlabel('Date')
-    plt.xticks(rotation='vertical', size='x-small')
-    plt.yticks(size='small')
-    plt.tick_params(which='both', length=0)
-    plt.legend(shadow=True, fontsize=legend_size, loc=legend_loc)
+        plot_size = plot_width(len(w)), 4.8
+
+    fig.set_size_inches(plot_size)
+    ax.grid(which='major', linewidth='0.4')
+    ax.grid(which='minor', linewidth='0.1')
+    ax.set_xlabel('Date')
+    max_ticks = max(int(plot_size[0] / day_width), 3)
+    locator = mpl.dates.AutoDateLocator(maxticks=max_ticks,
+                                        interval_multiples=False)
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mpl.dates.DateFormatter('%d %b %Y'))
+    ax.tick_params(axis='x', labelrotation=90, labelsize='x-small')
+    ax.tick_params(axis='y', which='major', labelsize='small')
+    ax.tick_params(which='both', length=0)
+    ax.legend(shadow=True, fontsize=legend_size, loc=legend_loc)
     os.makedirs('_site/img/', exist_ok=True)
-    plt.savefig('_site/img/' + filename,
+    fig.savefig('_site/img/' + filename,
                 dpi=300, bbox_inches='tight')
+    os.makedirs(PLOT_CACHE_DIR, exist_ok=True)
+    with open(os.path.join(PLOT_CACHE_DIR, filename + '.key'), 'w') as f:
+        f.write(key)
 
 
 def plot_total_cases_linear(data, recent, aspect):
     """Plot line chart for all case numbers (linear scale)."""
-    m = len(data.dates) - recent_days - 1 if recent else 0
+    w, key = plot_input(data, 'total-cases-linear', recent, aspect)
     tick_gap = 1_00_000
     ylim_pad = 6
     title_x, title_y = (0.29, 0.9) if recent else (0.5, 0.9)
 
-    plot_begin(data)
-    plt.plot(formatted_dates[m:], data.total_cases[m:],
-             marker='.', color=total_color, label='Total Cases', zorder=5)
-    plt.plot(formatted_dates[m:], data.active_cases[m:],
-             marker='.', color=active_color, label='Active Cases', zorder=4)
-    plt.plot(formatted_dates[m:], data.cured_cases[m:],
-             marker='.', color=cured_color, label='Cured Cases', zorder=3)
-    plt.plot(formatted_dates[m:], data.death_cases[m:],
-             marker='.', color=death_color,label='Death Cases', zorder=2)
-    ax = plt.gca()
+    total_cases = w.col('total_cases')
+    active_cases = w.col('active_cases')
+    cured_cases = w.col('cured_cases')
+    death_cases = w.col('death_cases')
+
+    fig, ax, xs = plot_begin(w)
+    ax.plot(*decimated('total-cases-linear', recent, xs, total_cases),
+            marker='.', color=total_color, label='Total Cases', zorder=5)
+    ax.plot(*decimated('total-cases-linear', recent, xs, active_cases),
+            marker='.', color=active_color, label='Active Cases', zorder=4)
+    ax.plot(*decimated('total-cases-linear', recent, xs, cured_cases),
+            marker='.', color=cured_color, label='Cured Cases', zorder=3)
+    ax.plot(*decimated('total-cases-linear', recent, xs, death_cases),
+            marker='.', color=death_color,label='Death Cases', zorder=2)
     ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(tick_gap * 5))
     ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(tick_gap))
     ax.yaxis.set_major_formatter(mpl.ticker.FuncFormatter(comma_formatter))
-    plt.ylabel('Count')
-    plt.xlim(left=0.2 if recent else -0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=top_ylim(data.total_cases[m:], tick_gap * ylim_pad, tick_gap))
-    plt.ylim(bottom=0)
-    plt.title('COVID-19 Cases in India', x=title_x, y=title_y, size='medium')
-    plot_end(data, 'total-cases-linear', recent, aspect)
+    ax.set_ylabel('Count')
+    ax.set_xlim(left=xs[0] + (0.2 if recent else -0.8), right=xs[-1] + 0.8)
+    ax.set_ylim(top=top_ylim(w.col('total_cases'), tick_gap * ylim_pad,
+                             tick_gap))
+    ax.set_ylim(bottom=0)
+    ax.set_title('COVID-19 Cases in India', x=title_x, y=title_y,
+                 size='medium')
+    plot_end(fig, ax, w, 'total-cases-linear', recent, aspect, key)
 
 
 def plot_total_cases_log(data, recent, aspect):
     """Plot line chart for all case numbers (log scale)."""
-    m = len(data.dates) - recent_days - 1 if recent else 0
-    ylim_top = max(data.total_cases[m:]) * 2
+    w, key = plot_input(data, 'total-cases-log', recent, aspect)
+    ylim_top = max(w.col('total_cases')) * 2
     title_x, title_y = (0.5, 0.6) if recent else (0.5, 0.90)
 
-    total_cases = data.total_cases
-    active_cases = data.active_cases
-    cured_cases = data.cured_cases
-    death_cases = data.death_cases
+    total_cases = w.col('total_cases')
+    active_cases = w.col('active_cases')
+    cured_cases = w.col('cured_cases')
+    death_cases = w.col('death_cases')
 
     total_cases, active_cases = shift(total_cases, active_cases, 0.05, -0.05)
     total_cases, cured_cases = shift(total_cases, cured_cases, 0.05, -0.05)
     cured_cases, active_cases = shift(cured_cases, active_cases, 0, -0.1)
 
-    plot_begin(data)
-    plt.yscale('log')
-    plt.plot(formatted_dates[m:], total_cases[m:],
-             marker='.', color=total_color, label='Total Cases', zorder=5)
-    plt.plot(formatted_dates[m:], active_cases[m:],
-             marker='.', color=active_color, label='Active Cases', zorder=4)
-    plt.plot(formatted_dates[m:], cured_cases[m:],
-             marker='.', color=cured_color, label='Cured Cases', zorder=3)
-    plt.plot(formatted_dates[m:], death_cases[m:],
-             marker='.', color=death_color,label='Death Cases', zorder=2)
-    ax = plt.gca()
+    fig, ax, xs = plot_begin(w)
+    ax.set_yscale('log')
+    ax.plot(*decimated('total-cases-log', recent, xs, total_cases),
+            marker='.', color=total_color, label='Total Cases', zorder=5)
+    ax.plot(*decimated('total-cases-log', recent, xs, active_cases),
+            marker='.', color=active_color, label='Active Cases', zorder=4)
+    ax.plot(*decimated('total-cases-log', recent, xs, cured_cases),
+            marker='.', color=cured_color, label='Cured Cases', zorder=3)
+    ax.plot(*decimated('total-cases-log', recent, xs, death_cases),
+            marker='.', color=death_color,label='Death Cases', zorder=2)
     ax.yaxis.set_major_locator(mpl.ticker.LogLocator())
     ax.yaxis.set_major_formatter(mpl.ticker.FuncFormatter(log_label_formatter))
     ax.yaxis.set_minor_formatter(mpl.ticker.FuncFormatter(log_label_formatter))
-    plt.tick_params(which='minor', labelsize='x-small')
-    plt.ylabel('Count')
-    plt.xlim(left=0.2 if recent else -0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=ylim_top)
-    plt.ylim(bottom=1)
-    plt.title('COVID-19 cases in India', x=title_x, y=title_y, size='medium')
-    plot_end(data, 'total-cases-log', recent, aspect)
+    ax.tick_params(which='minor', labelsize='x-small')
+    ax.set_ylabel('Count')
+    ax.set_xlim(left=xs[0] + (0.2 if recent else -0.8), right=xs[-1] + 0.8)
+    ax.set_ylim(top=ylim_top)
+    ax.set_ylim(bottom=1)
+    ax.set_title('COVID-19 cases in India', x=title_x, y=title_y,
+                 size='medium')
+    plot_end(fig, ax, w, 'total-cases-log', recent, aspect, key)
 
 
 def plot_new_cases(data, recent, aspect):
     """Plot bar chart for new cases on each day."""
-    m = len(data.dates) - recent_days if recent else 0
+    w, key = plot_input(data, 'new-cases', recent, aspect)
     tick_gap = 1000
     text_gap = 2
     ylim_pad = 30
 
-    plot_begin(data)
-    plt.bar(formatted_dates[m:], data.total_diffs[m:],
-            color=total_color, zorder=2,
-            label='New COVID-19 Cases in India on each day')
-    for i, value in enumerate(data.total_diffs[m:]):
-        plt.text(i, value + text_gap * tick_gap, value, ha='center',
-                 rotation='vertical', size='x-small', color=total_color)
-    ax = plt.gca()
+    fig, ax, xs = plot_begin(w)
+    ax.bar(xs, w.col('total_diffs'),
+           color=total_color, zorder=2,
+           label='New COVID-19 Cases in India on each day')
+    labels = ValueLabels(total_color)
+    for i, value in enumerate(w.col('total_diffs').tolist()):
+        labels.add(xs[i], value + text_gap * tick_gap, value)
+    ax.add_artist(labels)
     ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(tick_gap * 5))
     ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(tick_gap))
     ax.yaxis.set_major_formatter(mpl.ticker.FuncFormatter(comma_formatter))
-    plt.ylabel('Count')
-    plt.xlim(left=-0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=top_ylim(data.total_diffs[m:], tick_gap * ylim_pad, tick_gap))
-    plt.ylim(bottom=0)
-    plot_end(data, 'new-cases', recent, aspect)
+    ax.set_ylabel('Count')
+    ax.set_xlim(left=xs[0] - 0.8, right=xs[-1] + 0.8)
+    ax.set_ylim(top=top_ylim(w.col('total_diffs'), tick_gap * ylim_pad,
+                             tick_gap))
+    ax.set_ylim(bottom=0)
+    plot_end(fig, ax, w, 'new-cases', recent, aspect, key)
 
 
 def plot_growth_percents(data, recent, aspect):
     """Plot growth rate for each day."""
-    m = len(data.dates) - recent_days - 1 if recent else 0
+    w, key = plot_input(data, 'growth-percents', recent, aspect)
     tick_gap = 0.2 if recent else 10
     text_gap = 0.2 if recent else 1.0
     ylim_gap = 3 if recent else 5
 
-    # Preprocess data for plotting.
-    growths = data.total_growths
-    growth_nan = [float('nan') if g == -1 else g for g in growths]
-
     # Plot graph.
-    plot_begin(data)
-    plt.plot(formatted_dates[m:], growth_nan[m:],
-             marker='.', color=total_color,
-             label='Growth percent in number of total\n'
-                   'COVID-19 cases in India on each day\n'
-                   'compared to the previous day')
+    growths = w.col('total_growths')
+    fig, ax, xs = plot_begin(w)
+    ax.plot(*decimated('growth-percent', recent, xs, growths),
+            marker='.', color=total_color,
+            label='Growth percent in number of total\n'
+                  'COVID-19 cases in India on each day\n'
+                  'compared to the previous day')
 
     # Tweak the position of text values on the graph.
-    tweaks = [(0, 0)] * len(data.dates)
     if recent:
-        tweaks[data.dates.index('2021-03-30')] = (+0.1, +0.0)
-        tweaks[data.dates.index('2021-03-31')] = (-0.1, +0.0)
+        tweaks = {
+            '2021-03-30': (+0.1, +0.0),
+            '2021-03-31': (-0.1, +0.0),
+        }
     else:
-        tweaks[data.dates.index('2020-02-03')] = (+0.3, +0.0)
-        tweaks[data.dates.index('2020-02-04')] = (+0.5, +0.0)
-        tweaks[data.dates.index('2020-03-03')] = (+0.6, -0.5)
-        tweaks[data.dates.index('2020-03-05')] = (-0.6, -1.2)
-        tweaks[data.dates.index('2020-03-14')] = (-0.1, +0.1)
-        tweaks[data.dates.index('2020-03-16')] = (+0.1, +0.1)
-        tweaks[data.dates.index('2020-03-22')] = (+0.1, +0.0)
+        tweaks = {
+            '2020-02-03': (+0.3, +0.0),
+            '2020-02-04': (+0.5, +0.0),
+            '2020-03-03': (+0.6, -0.5),
+            '2020-03-05': (-0.6, -1.2),
+            '2020-03-14': (-0.1, +0.1),
+            '2020-03-16': (+0.1, +0.1),
+            '2020-03-22': (+0.1, +0.0),
+        }
 
     # Show text values on the graph.
+    labels = ValueLabels(total_color)
     prev_val = -1
-    for i, val in enumerate(growths[m:]):
-        if m != 0 and i == 0:
+    for i, (date, val) in enumerate(zip(w.dates, growths.tolist())):
+        if recent and i == 0:
             continue
-        if val != -1 and abs(val - prev_val) > 0.0001:
-            x = i + tweaks[m:][i][0]
-            y = val + (text_gap + tweaks[m:][i][1]) * tick_gap
+        if not math.isnan(val) and abs(val - prev_val) > 0.0001:
+            tweak = tweaks.get(date, (0, 0))
+            x = xs[i] + tweak[0]
+            y = val + (text_gap + tweak[1]) * tick_gap
             v = percent_str(val)
-            plt.text(x, y, v, ha='center', rotation='vertical',
-                     size='x-small', color=total_color)
+            labels.add(x, y, v)
             prev_val = val
+    ax.add_artist(labels)
 
     # Format axes.
-    ax = plt.gca()
     ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(tick_gap * 5))
     ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(tick_gap))
     ax.yaxis.set_major_formatter(mpl.ticker.FuncFormatter(percent_formatter))
-    plt.ylabel('Growth percent')
-    plt.xlim(left=0.2 if recent else -0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=top_ylim(growths[m:], tick_gap * ylim_gap, tick_gap))
-    plt.ylim(bottom=0)
-    plot_end(data, 'growth-percent', recent, aspect)
+    ax.set_ylabel('Growth percent')
+    ax.set_xlim(left=xs[0] + (0.2 if recent else -0.8), right=xs[-1] + 0.8)
+    ax.set_ylim(top=top_ylim(growths, tick_gap * ylim_gap, tick_gap))
+    ax.set_ylim(bottom=0)
+    plot_end(fig, ax, w, 'growth-percent', recent, aspect, key)
 
 
 def percent_str(x):
@@ -244,227 +423,246 @@ def plus_percent_str(x):
 
 def plot_doubling_times(data, recent, aspect):
     """Plot line chart for all case numbers (linear scale)."""
-    m = len(data.dates) - recent_days - 1 if recent else 0
+    w, key = plot_input(data, 'doubling-times', recent, aspect)
     tick_gap = 2
     text_gap = 3
     ylim_pad = 30 if recent else 30
 
-    # Preprocess data for plotting.
-    doubling_times = data.doubling_times
-    days_nan = [float('nan') if x == -1 else x for x in doubling_times]
-
     # Plot graph.
-    plot_begin(data)
-    plt.plot(formatted_dates[m:], days_nan[m:],
-             marker='.', color=total_color,
-             label='Number of days it took for the number of\n'
-                   'total COVID-19 cases in India to double')
+    doubling_times = w.col('doubling_times')
+    fig, ax, xs = plot_begin(w)
+    ax.plot(*decimated('doubling-time', recent, xs, doubling_times),
+            marker='.', color=total_color,
+            label='Number of days it took for the number of\n'
+                  'total COVID-19 cases in India to double')
 
     # Tweak the position of text values on the graph.
-    tweaks = [(0, 0)] * len(data.dates)
     if recent:
-        pass
+        tweaks = {}
     else:
-        pass
-        tweaks[data.dates.index('2020-02-04')] = (-0.2, +0.0)
-        tweaks[data.dates.index('2020-03-03')] = (+0.2, +0.2)
+        tweaks = {
+            '2020-02-04': (-0.2, +0.0),
+            '2020-03-03': (+0.2, +0.2),
+        }
 
     # Show text values on the graph.
+    labels = ValueLabels(total_color)
     prev_val = -1
-    for i, val in enumerate(doubling_times[m:]):
-        if m != 0 and i == 0:
+    for i, (date, val) in enumerate(zip(w.dates, doubling_times.tolist())):
+        if recent and i == 0:
             continue
-        if val != -1 and abs(val - prev_val) > 0.0001:
-            x = i + tweaks[m:][i][0]
-            y = val + (text_gap + tweaks[m:][i][1]) * tick_gap
+        if not math.isnan(val) and abs(val - prev_val) > 0.0001:
+            tweak = tweaks.get(date, (0, 0))
+            x = xs[i] + tweak[0]
+            y = val + (text_gap + tweak[1]) * tick_gap
             v = '{:.1f}'.format(val)
-            plt.text(x, y, v, ha='center', rotation='vertical',
-                     size='x-small', color=total_color)
+            labels.add(x, y, v)
             prev_val = val
+    ax.add_artist(labels)
 
     # Format axes.
-    ax = plt.gca()
     ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(tick_gap * 5))
     ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(tick_gap))
-    plt.ylabel('Days')
-    plt.xlim(left=0.2 if recent else -0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=top_ylim(doubling_times[m:], tick_gap * ylim_pad, tick_gap))
-    plt.ylim(bottom=0)
-    plot_end(data, 'doubling-time', recent, aspect)
+    ax.set_ylabel('Days')
+    ax.set_xlim(left=xs[0] + (0.2 if recent else -0.8), right=xs[-1] + 0.8)
+    ax.set_ylim(top=top_ylim(doubling_times, tick_gap * ylim_pad, tick_gap))
+    ax.set_ylim(bottom=0)
+    plot_end(fig, ax, w, 'doubling-time', recent, aspect, key)
 
 
 def plot_cured_percents(data, recent, aspect):
     """Plot line chart for cured and death percents."""
-    m = len(data.dates) - recent_days - 1 if recent else 0
+    w, key = plot_input(data, 'cured-percents', recent, aspect)
     tick_gap = 2
     cured_text_gap = -3.7
     death_text_gap = 1.5
 
-    # Preprocess data for plotting.
-    cured_nan = [float('nan') if x == -1 else x for x in data.cured_percents]
-    death_nan = [float('nan') if x == -1 else x for x in data.death_percents]
-
     # Plot graph.
-    plot_begin(data)
-    plt.plot(formatted_dates[m:], cured_nan[m:],
-             marker='.', color=cured_color,
-             label='Percent of closed cases that are cured cases')
-    plt.plot(formatted_dates[m:], death_nan[m:],
-             marker='.', color=death_color,
-             label='Percent of closed cases that are death cases')
+    cured_percents = w.col('cured_percents')
+    death_percents = w.col('death_percents')
+    fig, ax, xs = plot_begin(w)
+    ax.plot(*decimated('cured-percent', recent, xs, cured_percents),
+            marker='.', color=cured_color,
+            label='Percent of closed cases that are cured cases')
+    ax.plot(*decimated('cured-percent', recent, xs, death_percents),
+            marker='.', color=death_color,
+            label='Percent of closed cases that are death cases')
 
     # Tweak the position of text values on the graph.
-    cured_tweaks = [(0, 0)] * len(data.dates)
-    death_tweaks = [(0, 0)] * len(data.dates)
     if recent:
-        pass
+        cured_tweaks = {}
+        death_tweaks = {}
     else:
-        cured_tweaks[data.dates.index('2020-03-13')] = (+0.3, +0.0)
-        death_tweaks[data.dates.index('2020-03-13')] = (+0.3, +0.0)
+        cured_tweaks = {'2020-03-13': (+0.3, +0.0)}
+        death_tweaks = {'2020-03-13': (+0.3, +0.0)}
 
     # Show values on the graph.
+    cured_labels = ValueLabels(cured_color)
+    death_labels = ValueLabels(death_color)
     prev_cured = -1
-    for i, (cured, death) in enumerate(zip(data.cured_percents[m:],
-                                           data.death_percents[m:])):
-        if m != 0 and i == 0:
+    for i, (date, cured, death) in enumerate(zip(w.dates,
+                                                 cured_percents.tolist(),
+                                                 death_percents.tolist())):
+        if recent and i == 0:
             continue
-        if cured != -1 and abs(cured - prev_cured) > 1e-5:
+        if not math.isnan(cured) and abs(cured - prev_cured) > 1e-5:
             # Print cured value.
-            x = i + cured_tweaks[i][0]
-            y = cured + (cured_text_gap + cured_tweaks[m:][i][1]) * tick_gap
+            tweak = cured_tweaks.get(date, (0, 0))
+            x = xs[i] + tweak[0]
+            y = cured + (cured_text_gap + tweak[1]) * tick_gap
             v = '{:.0f}%'.format(cured)
-            plt.text(x, y, v, ha='center', rotation='vertical',
-                     size='x-small', color=cured_color)
+            cured_labels.add(x, y, v)
             # Print death value.
-            x = i + death_tweaks[i][0]
-            y = death + (death_text_gap + death_tweaks[m:][i][1]) * tick_gap
+            tweak = death_tweaks.get(date, (0, 0))
+            x = xs[i] + tweak[0]
+            y = death + (death_text_gap + tweak[1]) * tick_gap
             v = '{:.0f}%'.format(death)
-            plt.text(x, y, v, ha='center', rotation='vertical',
-                     size='x-small', color=death_color)
+            death_labels.add(x, y, v)
             prev_cured = cured
+    ax.add_artist(cured_labels)
+    ax.add_artist(death_labels)
 
     # Format axes.
-    ax = plt.gca()
     ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(tick_gap * 5))
     ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(tick_gap))
     ax.yaxis.set_major_formatter(mpl.ticker.FuncFormatter(percent_formatter))
-    plt.ylabel('Percent')
-    plt.xlim(left=0.2 if recent else -0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=100)
-    plt.ylim(bottom=0)
-    plot_end(data, 'cured-percent', recent, aspect, 'center left')
+    ax.set_ylabel('Percent')
+    ax.set_xlim(left=xs[0] + (0.2 if recent else -0.8), right=xs[-1] + 0.8)
+    ax.set_ylim(top=100)
+    ax.set_ylim(bottom=0)
+    plot_end(fig, ax, w, 'cured-percent', recent, aspect, key, 'center left')
 
 
 def plot_cured_ratios(data, recent, aspect):
     """Plot line chart for cured ratio."""
-    m = len(data.dates) - recent_days - 1 if recent else 0
+    w, key = plot_input(data, 'cured-ratios', recent, aspect)
     tick_gap = 1.0
     text_gap = 2
     ylim_pad = 20 if recent else 10
 
-    # Preprocess data for plotting.
-    ratios = data.cured_ratios
-    cured_nan = [float('nan') if x == -1 else x for x in ratios]
-
     # Plot graph.
-    plot_begin(data)
-    plt.plot(formatted_dates[m:], cured_nan[m:],
-             marker='.', color=cured_color,
-             label='Number of cured cases per death case\n'
-                   'among closed COVID-19 cases in India')
+    ratios = w.col('cured_ratios')
+    fig, ax, xs = plot_begin(w)
+    ax.plot(*decimated('cured-ratio', recent, xs, ratios),
+            marker='.', color=cured_color,
+            label='Number of cured cases per death case\n'
+                  'among closed COVID-19 cases in India')
 
     # Print values on the graph.
-    tweaks = [(0, 0)] * len(data.dates)
+    labels = ValueLabels(cured_color)
     prev_val = -1
-    for i, val in enumerate(ratios[m:]):
-        if m != 0 and i == 0:
+    for i, val in enumerate(ratios.tolist()):
+        if recent and i == 0:
             continue
-        if val != -1 and abs(val - prev_val) > 0.0001:
-            x = i + tweaks[m:][i][0]
-            y = val + (text_gap + tweaks[m:][i][1]) * tick_gap
+        if not math.isnan(val) and abs(val - prev_val) > 0.0001:
+            x = xs[i]
+            y = val + text_gap * tick_gap
             v = '{:.1f}'.format(val)
-            plt.text(x, y, v, ha='center', rotation='vertical',
-                     size='x-small', color=cured_color)
+            labels.add(x, y, v)
             prev_val = val
+    ax.add_artist(labels)
 
     # Format axes.
-    ax = plt.gca()
     ax.yaxis.set_major_locator(mpl.ticker.MultipleLocator(tick_gap * 5))
     ax.yaxis.set_minor_locator(mpl.ticker.MultipleLocator(tick_gap))
-    plt.ylabel('Ratio')
-    plt.xlim(left=0.2 if recent else -0.8, right=len(data.dates[m:]) - 0.2)
-    plt.ylim(top=top_ylim(ratios[m:], tick_gap * ylim_pad, tick_gap))
-    plt.ylim(bottom=0)
-    plot_end(data, 'cured-ratio', recent, aspect)
+    ax.set_ylabel('Ratio')
+    ax.set_xlim(left=xs[0] + (0.2 if recent else -0.8), right=xs[-1] + 0.8)
+    ax.set_ylim(top=top_ylim(ratios, tick_gap * ylim_pad, tick_gap))
+    ax.set_ylim(bottom=0)
+    plot_end(fig, ax, w, 'cured-ratio', recent, aspect, key)
 
 
-def plot_all(data):
-    """Plot all graphs."""
-    log.log('Rendering total-cases-linear-recent plot ...')
-    plot_total_cases_linear(data, recent=True, aspect='square')
+def task_name(name, recent):
+    """Return name of graph plotted by a task."""
+    return name + '-recent' if recent else name
 
-    log.log('Rendering total-cases-linear plot ...')
-    plot_total_cases_linear(data, recent=False, aspect=None)
 
-    log.log('Rendering total-cases-log-recent plot ...')
-    plot_total_cases_log(data, recent=True, aspect='square')
+def all_tasks():
+    """Return name, recent and aspect arguments to plot all graphs."""
+    tasks = []
+    for name in plots:
+        tasks.append((name, True, 'square'))
+        tasks.append((name, False, None))
+    return tasks
 
-    log.log('Rendering total-cases-log plot ...')
-    plot_total_cases_log(data, recent=False, aspect=None)
 
-    log.log('Rendering new-cases-recent plot ...')
-    plot_new_cases(data, recent=True, aspect='square')
+def recent_wide_tasks():
+    """Return name, recent and aspect arguments to plot wide graphs."""
+    return [(name, True, 'wide') for name in plots]
 
-    log.log('Rendering new-cases plot ...')
-    plot_new_cases(data, recent=False, aspect=None)
 
-    log.log('Rendering growth-percents-recent plot ...')
-    plot_growth_percents(data, recent=True, aspect='square')
+def init_worker(data):
+    """Receive data to be plotted in a worker process."""
+    global worker_data
+    worker_data = data
 
-    log.log('Rendering growth-percents plot ...')
-    plot_growth_percents(data, recent=False, aspect=None)
 
-    log.log('Rendering doubling-times-recent plot ...')
-    plot_doubling_times(data, recent=True, aspect='square')
+def plot_task(name, recent, aspect):
+    """Plot one graph with data received by this worker process."""
+    plots[name](worker_data, recent, aspect)
+    return task_name(name, recent)
 
-    log.log('Rendering doubling-times plot ...')
-    plot_doubling_times(data, recent=False, aspect=None)
 
-    log.log('Rendering cured-percents-recent plot ...')
-    plot_cured_percents(data, recent=True, aspect='square')
+def stale_tasks(data, tasks):
+    """Return tasks whose graphs have changed inputs since last plotted."""
+    stale = []
+    for name, recent, aspect in tasks:
+        w, key = plot_input(data, name, recent, aspect)
+        if not plot_unchanged(plot_inputs[name][0], recent, key):
+            stale.append((name, recent, aspect))
+    return stale
 
-    log.log('Rendering cured-percents plot ...')
-    plot_cured_percents(data, recent=False, aspect=None)
 
-    log.log('Rendering cured-ratios-percent plot ...')
-    plot_cured_ratios(data, recent=True, aspect='square')
+def start_plots(data, jobs, tasks=None):
+    """Start plotting changed graphs in up to jobs worker processes."""
+    tasks = stale_tasks(data, all_tasks() if tasks is None else tasks)
+    if not tasks:
+        return []
+    context = multiprocessing.get_context('spawn')
+    executor = concurrent.futures.ProcessPoolExecutor(
+        min(jobs, len(tasks)), mp_context=context,
+        initializer=init_worker, initargs=(data,))
+    futures = [executor.submit(plot_task, *task) for task in tasks]
+    executor.shutdown(wait=False)
+    return futures
 
-    log.log('Rendering cured-ratios plot ...')
-    plot_cured_ratios(data, recent=False, aspect=None)
 
+def wait_plots(futures):
+    """Wait for graphs started with start_plots() to be plotted."""
+    for future in futures:
+        log.log('Rendered {} plot', future.result())
 
-def plot_recent_wide(data):
-    """Plot recent graphs only in approx. with 16:9 aspect ratio."""
-    log.log('Rendering total-cases-linear-recent plot ...')
-    plot_total_cases_linear(data, recent=True, aspect='wide')
 
-    log.log('Rendering total-cases-log-recent plot ...')
-    plot_total_cases_log(data, recent=True, aspect='wide')
+def run_plots(data, tasks, jobs):
+    """Plot graphs, using jobs worker processes if more than one."""
+    if jobs > 1:
+        wait_plots(start_plots(data, jobs, tasks))
+        return
+    for name, recent, aspect in stale_tasks(data, tasks):
+        log.log('Rendering {} plot ...', task_name(name, recent))
+        plots[name](data, recent, aspect)
 
-    log.log('Rendering new-cases-recent plot ...')
-    plot_new_cases(data, recent=True, aspect='wide')
 
-    log.log('Rendering growth-percents-recent plot ...')
-    plot_growth_percents(data, recent=True, aspect='wide')
+def plot_all(data, jobs=1):
+    """Plot all graphs."""
+    run_plots(data, all_tasks(), jobs)
+
 
-    log.log('Rendering doubling-times-recent plot ...')
-    plot_doubling_times(data, recent=True, aspect='wide')
+def plot_recent_wide(data, jobs=1):
+    """Plot recent graphs only in approx. with 16:9 aspect ratio."""
+    run_plots(data, recent_wide_tasks(), jobs)
 
-    log.log('Rendering cured-percents-recent plot ...')
-    plot_cured_percents(data, recent=True, aspect='wide')
 
-    log.log('Rendering cured-ratios-percent plot ...')
-    plot_cured_ratios(data, recent=True, aspect='wide')
+# Functions that plot each graph, in the order they are rendered.
+plots = {
+    'total-cases-linear': plot_total_cases_linear,
+    'total-cases-log': plot_total_cases_log,
+    'new-cases': plot_new_cases,
+    'growth-percents': plot_growth_percents,
+    'doubling-times': plot_doubling_times,
+    'cured-percents': plot_cured_percents,
+    'cured-ratios': plot_cured_ratios,
+}
 
 
 def comma_formatter(x, pos):
@@ -498,33 +696,35 @@ def percent_formatter(x, pos):
 
 def top_ylim(data, padding, round_to):
     """Calculate top ylim by adding padding to max data value."""
-    y = max(data) + padding
+    y = np.nanmax(data) + padding
     y = y - (y % round_to)
     return y
 
 
 def shift(a, b, shift_a, shift_b):
-    """Shift overlapping values in lists a and b to make them different."""
-    new_a = a[:]
-    new_b = b[:]
-    for i, (total, active) in enumerate(zip(a, b)):
-        if total == active:
-            new_a[i] += shift_a
-            new_b[i] += shift_b
-    return new_a, new_b
+    """Shift overlapping values in arrays a and b to make them different."""
+    overlap = (a == b)
+    return (np.where(overlap, a + shift_a, a),
+            np.where(overlap, b + shift_b, b))
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-w', action='store_true',
                         help='Plot recent graphs only with 16:9 aspect ratio')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse JSON instead of using cached data')
+    parser.add_argument('-j', type=int, default=os.cpu_count() or 1,
+                        metavar='N', dest='jobs',
+                        help='Plot graphs in N worker processes '
+                             '(default: number of CPUs)')
     args = parser.parse_args()
 
-    data = archive.load()
+    data = archive.load(cache=not args.no_cache)
     if args.w:
-        plot_recent_wide(data)
+        plot_recent_wide(data, args.jobs)
     else:
-        plot_all(data)
+        plot_all(data, args.jobs)
 
 
 if __name__ == '__main__':
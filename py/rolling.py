@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 Susam Pal
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY
+# CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT,
+# TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+"""Rolling-window statistics over dense daily series.
+
+Each function computes its statistic for every position of the input in
+a single vectorized pass using running sums, so the cost does not depend
+on the window length. The first window - 1 positions use the partial
+windows available at the beginning of the series. NaN represents an
+undefined value, and a window that contains NaN has an undefined result.
+"""
+
+
+import numpy as np
+
+
+def rolling_sum(values, window):
+    """Return sum of the last window values at each position."""
+    values = np.asarray(values)
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums
+
+
+def rolling_count(n, window):
+    """Return number of values in the window at each position."""
+    return np.minimum(np.arange(1, n + 1), window)
+
+
+def rolling_mean(values, window):
+    """Return arithmetic mean of the last window values."""
+    values = np.asarray(values)
+    nan_counts = rolling_sum(np.isnan(values).astype(np.int64), window)
+    means = (rolling_sum(np.nan_to_num(values), window) /
+             rolling_count(len(values), window))
+    means[nan_counts > 0] = np.nan
+    return means
+
+
+def rolling_geomean(values, window):
+    """Return geometric mean of the last window positive values."""
+    values = np.asarray(values, dtype=np.float64)
+    logs = np.full(len(values), np.nan)
+    np.log(values, out=logs, where=(values > 0))
+    return np.exp(rolling_mean(logs, window))
+
+
+def rolling_growth(percents, window):
+    """Return average compounded growth percent of the last window values.
+
+    This is the geometric mean of the growth factors corresponding to
+    the growth percents, expressed as a growth percent.
+    """
+    factors = 1 + np.asarray(percents) / 100
+    return 100 * (rolling_geomean(factors, window) - 1)
+
+
+def cagr(values, window):
+    """Return compound daily growth percent over the last window days.
+
+    Values before the beginning of the series are considered to be 0,
+    so the result is undefined for the first window positions.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(len(values), np.nan)
+    prev = values[:-window]
+    curr = values[window:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growths = 100 * ((curr / prev) ** (1 / window) - 1)
+    out[window:] = np.where(prev == 0, np.nan, growths)
+    return out
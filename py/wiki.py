@@ -25,12 +25,14 @@
 
 
 import argparse
-import datetime
 import difflib
 import html
+import math
 import sys
 
-from py import archive, log, mohfw
+import numpy as np
+
+from py import archive, log, mohfw, rolling
 
 
 """Generate Wikipedia markup code.
@@ -47,7 +49,6 @@ generate the corresponding markups:
 """
 
 
-import datetime
 import re
 import urllib
 import urllib.request
@@ -107,10 +108,10 @@ def gldg(x):
     return '{:,d}'.format(x)
 
 
-def wiki1():
+def wiki1(cache=True):
     """Generate Wikipedia markup code for medical cases chart template."""
     ignore_dates = ('2020-02-04', '2020-02-27')
-    data = archive.load(ignore_dates=ignore_dates)
+    data = archive.load(ignore_dates=ignore_dates, cache=cache)
     update = source = fetch_wiki_source(WIKI_SRC1)
     update = replace_within('Total confirmed -->\n',
                             '\n<!-- Date',
@@ -123,9 +124,11 @@ def wiki1():
 def wiki1_data(data):
     """Generate data entries for medical cases chart template."""
     out = []
+    calendar = data.calendar
 
-    for i, (date, total, cured, death) in enumerate(zip(
-            data.dates, data.total_cases, data.cured_cases, data.death_cases)):
+    for i, (date, day, total, cured, death) in enumerate(zip(
+            data.dates, data.days, data.total_cases, data.cured_cases,
+            data.death_cases)):
 
         if date == '2020-06-17':
             # date;deaths;cured;total;4th;5th;col1;chg1;col2;chg2
@@ -142,12 +145,8 @@ def wiki1_data(data):
             out.append('{};{};{};{}'.format(date, death, cured, total))
 
         # Print continuation lines.
-        curr_index = data.dates.index(date)
-        if curr_index < len(data.dates) - 1:
-            curr_datetime = data.datetimes[curr_index]
-            next_datetime = data.datetimes[curr_index + 1]
-            if (next_datetime - curr_datetime).days != 1:
-                month = next_datetime.strftime('%b')
+        if i < len(data.dates) - 1:
+            if not calendar.present[calendar.index(day) + 1]:
                 out.append(';{};{};{}'.format('' if death == 0 else death,
                                               '' if cured == 0 else cured,
                                               '' if total == 0 else total))
@@ -317,13 +316,13 @@ def markup_num(n_str):
     # return ' style="color:gray;" |0' if n_str == '0' else n_str
 
 
-def wiki3():
+def wiki3(cache=True):
     """Generate Wikipedia markup code for statistics charts."""
     ignore_dates = ('2020-02-04', '2020-02-27')
-    data = archive.load(ignore_dates=ignore_dates)
+    data = archive.load(ignore_dates=ignore_dates, cache=cache)
     update = source = fetch_wiki_source(WIKI_SRC3)
 
-    full_dates = ', '.join(x.strftime('%Y-%m-%d') for x in data.datetimes)
+    full_dates = ', '.join(data.dates)
     # Cases.
     total_cases = ', '.join(str(y) for y in data.total_cases)
     active_cases = ', '.join(str(y) for y in data.active_cases)
@@ -332,22 +331,23 @@ def wiki3():
 
     # New cases.
     total_dates, total_diffs, total_avgs = \
-        format_diffs(*expand_diffs(data.datetimes, data.total_diffs))
+        format_diffs(*expand_diffs(data.calendar, data.col('total_diffs')))
     cured_dates, cured_diffs, cured_avgs = \
-        format_diffs(*expand_diffs(data.datetimes, data.cured_diffs))
+        format_diffs(*expand_diffs(data.calendar, data.col('cured_diffs')))
     death_dates, death_diffs, death_avgs = \
-        format_diffs(*trim_zeros(*expand_diffs(data.datetimes, data.death_diffs)))
+        format_diffs(*trim_zeros(*expand_diffs(data.calendar,
+                                               data.col('death_diffs'))))
 
     # Daily new cases vs. active cases.
     vs_dates, vs_percents, vs_avgs, vs_cagrs = \
-        vs_data(data.datetimes, data.total_diffs, data.active_cases)
+        vs_data(data.calendar, data.col('total_diffs'),
+                data.col('active_cases'))
 
     # CFR
-    cfr_start = data.dates.index('2020-03-12')
-    cfr_dates = ', '.join(x.strftime('%Y-%m-%d')
-                          for x in data.datetimes[cfr_start:])
+    cfr = data.window(start='2020-03-12')
+    cfr_dates = ', '.join(cfr.dates)
     cfr_percents = ', '.join('{:.2f}'.format(y) for
-                             y in data.cfr_percents[cfr_start:])
+                             y in cfr.col('cfr_percents').tolist())
 
     # For testing regex matches only.
     """
@@ -450,106 +450,49 @@ def wiki3():
     open('wiki3.diff', 'w').write(diff(source, update))
 
 
-def expand_diffs(datetimes, numbers):
+def expand_diffs(calendar, numbers):
     """Fill in missing entries and compute 7-day averages."""
-    date_num_dict = dict(zip(datetimes, numbers))
-
-    min_date = datetimes[0]
-    max_date = datetimes[-1]
-    expanded_dates = []
-    expanded_nums = []
-    expanded_avgs = []
-
-    curr_date = min_date
-    while curr_date <= max_date:
-        expanded_dates.append(curr_date)
-        expanded_nums.append(date_num_dict.get(curr_date, 0))
-        last_7_nums = expanded_nums[-7:]
-        last_7_avg = sum(last_7_nums) / len(last_7_nums)
-        expanded_avgs.append('{:.2f}'.format(last_7_avg))
-        curr_date += datetime.timedelta(days=1)
-
-    return expanded_dates, expanded_nums, expanded_avgs
+    expanded_nums = calendar.zero_filled(numbers)
+    expanded_avgs = rolling.rolling_mean(expanded_nums, 7)
+    expanded_avgs = ['{:.2f}'.format(x) for x in expanded_avgs.tolist()]
+    return calendar.days.tolist(), expanded_nums.tolist(), expanded_avgs
 
 
-def format_diffs(datetimes, nums, avgs):
-    date_strs = [d.strftime('%Y-%m-%d') for d in datetimes]
+def format_diffs(days, nums, avgs):
+    date_strs = [archive.format_day(d) for d in days]
     return (', '.join(date_strs),
             ', '.join(str(x) for x in nums),
             ', '.join(avgs))
 
 
-def vs_data(datetimes, total_diffs, active_cases):
+def vs_data(calendar, total_diffs, active_cases):
     """Compute new cases vs. active cases statistics."""
-    total_diffs_dict = dict(zip(datetimes, total_diffs))
-    active_cases_dict = dict(zip(datetimes, active_cases))
-
-    min_date = datetimes[0]
-    max_date = datetimes[-1]
-    vs_dates = []
-    vs_percents = []
-    vs_avgs = []
-    vs_cagrs = []
-
-    curr_date = min_date
-    prev_active_cases = 0
-    curr_active_cases = 0
-    prev_week_active_cases = 0
-
-    while curr_date <= max_date:
-        prev_date = curr_date - datetime.timedelta(days=1)
-        prev_week_date = curr_date - datetime.timedelta(days=7)
-
-        curr_new_cases = total_diffs_dict.get(curr_date, 0)
-        prev_active_cases = \
-            active_cases_dict.get(prev_date, prev_active_cases)
-        curr_active_cases = \
-            active_cases_dict.get(curr_date, curr_active_cases)
-        prev_week_active_cases = \
-            active_cases_dict.get(prev_week_date, prev_week_active_cases)
-
-        # Date.
-        vs_dates.append(curr_date.strftime('%Y-%m-%d'))
-
-        # New cases percent of active cases.
-        if prev_active_cases == 0:
-            vs_percents.append(-1)
-        else:
-            vs_percents.append(100 * curr_new_cases / prev_active_cases)
+    new_cases = calendar.zero_filled(total_diffs)
+    curr_active_cases = calendar.forward_filled(active_cases)
+    prev_active_cases = np.concatenate(([0], curr_active_cases[:-1]))
 
-        # Average of new cases percent of active cases.
-        last_7_percents = vs_percents[-7:]
-        if -1 in last_7_percents:
-            vs_avgs.append(-1)
-        else:
-            avg = (100 *
-                   (prod([(1 + x/100)for x in last_7_percents])**(1/7) - 1))
-            vs_avgs.append(avg)
+    # New cases percent of active cases.
+    vs_percents = archive.calc_percents(new_cases, prev_active_cases)
 
-        # CAGR of active cases.
-        if prev_week_active_cases == 0:
-            vs_cagrs.append(-1)
-        else:
-            cagr = (100 *
-                    ((curr_active_cases / prev_week_active_cases)**(1/7) - 1))
-            vs_cagrs.append(cagr)
+    # Average of new cases percent of active cases.
+    vs_avgs = rolling.rolling_growth(vs_percents, 7)
 
-        curr_date += datetime.timedelta(days=1)
+    # CAGR of active cases.
+    vs_cagrs = rolling.cagr(curr_active_cases, 7)
 
+    vs_dates = [archive.format_day(d) for d in calendar.days.tolist()]
     return (', '.join(vs_dates[41:]),
-            ', '.join('{:.2f}'.format(x) for x in vs_percents[41:]),
-            ', '.join('{:.2f}'.format(x) for x in vs_avgs[41:]),
-            ', '.join('{:.2f}'.format(x) for x in vs_cagrs[41:]))
+            ', '.join(stat_str(x) for x in vs_percents[41:].tolist()),
+            ', '.join(stat_str(x) for x in vs_avgs[41:].tolist()),
+            ', '.join(stat_str(x) for x in vs_cagrs[41:].tolist()))
 
 
-def prod(nums):
-    result = 1
-    for n in nums:
-        result *= n
-    return result
+def stat_str(x):
+    """Format statistic with two decimal places and -1 if undefined."""
+    return '{:.2f}'.format(-1 if math.isnan(x) else x)
 
 
-def trim_zeros(datetimes, numbers, averages):
+def trim_zeros(days, numbers, averages):
     """Remove leading zero entries from specified dates and numbers."""
     cleaned_dates = []
     cleaned_numbers = []
@@ -565,7 +508,7 @@ def trim_zeros(datetimes, numbers, averages):
         cleaned_numbers.append(n)
         cleaned_averages.append(a)
 
-    for i, (d, n, a) in enumerate(zip(datetimes, numbers, averages)):
+    for i, (d, n, a) in enumerate(zip(days, numbers, averages)):
         if mode == 'LEADING_ZEROS' and n == 0:
             continue
         else:
@@ -574,7 +517,7 @@ def trim_zeros(datetimes, numbers, averages):
     return cleaned_dates, cleaned_numbers, cleaned_averages
 
 
-def clean_zeros(datetimes, numbers, averages):
+def clean_zeros(days, numbers, averages):
     """Remove zero entries from specified dates and numbers."""
     cleaned_dates = []
     cleaned_numbers = []
@@ -590,7 +533,7 @@ def clean_zeros(datetimes, numbers, averages):
         cleaned_numbers.append(n)
         cleaned_averages.append(a)
 
-    for i, (d, n, a) in enumerate(zip(datetimes, numbers, averages)):
+    for i, (d, n, a) in enumerate(zip(days, numbers, averages)):
         if mode == 'LEADING_ZEROS':
             if n == 0:
                 continue
@@ -609,7 +552,7 @@ def clean_zeros(datetimes, numbers, averages):
                 #cleaned_numbers.append(n)
                 #cleaned_averages.append(a)
             else:
-                normal_append(datetimes[i - 1], 0)
+                normal_append(days[i - 1], 0)
                 normal_append(d, n, a)
         elif mode == 'MULTIPLE_ZEROS':
             if n == 0:
@@ -629,6 +572,8 @@ def main():
                         help='Markup for medical cases table')
     parser.add_argument('-3', action='store_true',
                         help='Markup for charts')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse JSON instead of using cached data')
     args = vars(parser.parse_args())
 
     if not any((args['1'], args['2'], args['3'])):
@@ -636,13 +581,13 @@ def main():
         sys.exit(1)
 
     if args['1']:
-        wiki1()
+        wiki1(cache=not args['no_cache'])
 
     if args['2']:
         wiki2()
 
     if args['3']:
-        wiki3()
+        wiki3(cache=not args['no_cache'])
 
     log.log('Done')
 
@@ -0,0 +1,45 @@
+// Load rows of the case numbers table for older months on demand.
+//
+// The home page rendered with makesite.py --lazy contains rows for the
+// recent days only. Each older month is a placeholder <tbody> element
+// whose rows are loaded from rows/YYYY-MM.json when a link to the month
+// or to one of its dates is followed.
+(function () {
+  'use strict'
+
+  function load (month, callback) {
+    var tbody = document.querySelector('tbody[data-month="' + month + '"]')
+    if (tbody === null || tbody.getAttribute('data-loaded') !== null) {
+      callback()
+      return
+    }
+    var xhr = new XMLHttpRequest()
+    xhr.open('GET', 'rows/' + month + '.json')
+    xhr.onload = function () {
+      if (xhr.status === 200) {
+        tbody.innerHTML = JSON.parse(xhr.responseText).html
+        tbody.setAttribute('data-loaded', '')
+      }
+      callback()
+    }
+    xhr.onerror = callback
+    xhr.send()
+  }
+
+  function show () {
+    var id = decodeURIComponent(window.location.hash.slice(1))
+    var match = /^(\d{4}-\d{2})(-\d{2})?$/.exec(id)
+    if (match === null) {
+      return
+    }
+    load(match[1], function () {
+      var elem = document.getElementById(id)
+      if (elem !== null) {
+        elem.scrollIntoView()
+      }
+    })
+  }
+
+  window.addEventListener('hashchange', show)
+  show()
+})()